@@ -0,0 +1,77 @@
+"""
+Compares the html extractors on parse time and output size.
+
+Usage: python -m benchmarks.extractors [page.html ...] [--runs N]
+Without any file, a synthetic page with typical boilerplate is used.
+"""
+
+import argparse
+import os
+import statistics
+import time
+from pathlib import Path
+
+# importing src checks the envs of the app, which the extractors themselves don't use.
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+if "ENCRYPTED_COOKIE_KEY" not in os.environ:
+    from cryptography.fernet import Fernet
+
+    os.environ["ENCRYPTED_COOKIE_KEY"] = Fernet.generate_key().decode()
+
+from src.handlers.extractors import LxmlExtractor, extractors  # noqa: E402
+
+
+def synthetic_page(sections: int = 200):
+    links = "".join(f"<li><a href='/{i}'>Link {i}</a></li>" for i in range(40))
+    nav = f"<nav><ul>{links}</ul></nav>"
+    banner = (
+        "<div id='cookie-banner' class='cookie consent'>"
+        "We use cookies to improve your experience. <button>Accept</button></div>"
+    )
+    body = "".join(
+        f"<section><h2>Service {i}</h2><p>Our <b>service {i}</b> helps organisations with"
+        f" support, sales and onboarding. Plans start at {i * 10} dollars per month.</p>"
+        "<p>Contact us for a demo.</p></section>"
+        for i in range(sections)
+    )
+    footer = "<footer>" + "<p>Copyright. All rights reserved.</p>" * 5 + "</footer>"
+    scripts = "<script>" + "var tracking = {};" * 500 + "</script><style>body{color:red}</style>"
+
+    return (
+        f"<html><head><title>Acme</title>{scripts}</head>"
+        f"<body>{banner}<header>{nav}</header><main>{body}</main>{footer}</body></html>"
+    ).encode("utf-8")
+
+
+def bench(extractor, content: bytes, runs: int):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        text = extractor.extract(content)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return statistics.median(timings), len(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("files", nargs="*", type=Path)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    pages = {path.name: path.read_bytes() for path in args.files}
+    if len(pages) == 0:
+        pages["synthetic"] = synthetic_page()
+
+    candidates = {name: cls() for name, cls in extractors.items()}
+    candidates["lxml (main only)"] = LxmlExtractor(main_content_only=True)
+
+    print(f"{'page':<24}{'extractor':<20}{'median ms':>12}{'chars':>10}")
+    for page, content in pages.items():
+        for name, extractor in candidates.items():
+            ms, size = bench(extractor, content, args.runs)
+            print(f"{page[:23]:<24}{name:<20}{ms:>12.2f}{size:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""
+Drives `/process` end to end on csv files of growing size, reporting throughput,
+row latencies, peak RSS and thread count for each size.
+
+Usage: python -m benchmarks.process_pipeline [--sizes 10,100,...] [--latency SECS]
+Largest default size of 100k rows takes a while, pass smaller sizes for a quick run.
+Runs offline: the fake LLM backend answers in process, url rows are served by a local
+fixture server, mongo is mongomock and S3 is moto (see requirements-dev.txt). Statuses go to
+a dict and caches skip their mongo tier, as mongomock scans its collections on every lookup,
+which would make the run quadratic and measure mongomock instead of the pipeline.
+"""
+
+import argparse
+import http.server
+import json
+import logging
+import os
+import resource
+import statistics
+import threading
+import time
+from functools import partial
+
+try:
+    import mongomock
+    from moto import mock_aws
+except ImportError:
+    exit("Benchmark needs `mongomock` and `moto`, install them from requirements-dev.txt.")
+
+os.environ["LLM_BACKEND"] = "fake"
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+if "ENCRYPTED_COOKIE_KEY" not in os.environ:
+    from cryptography.fernet import Fernet
+
+    os.environ["ENCRYPTED_COOKIE_KEY"] = Fernet.generate_key().decode()
+
+import boto3  # noqa: E402
+import httpx  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from main import app  # noqa: E402 , imported first as it sets up the import order of src
+import src.handlers.funcs as funcs  # noqa: E402
+import src.mongo.utils as mongo_utils  # noqa: E402
+import src.openai.backends as backends  # noqa: E402
+from src.handlers.dedup import SourceDedup  # noqa: E402
+from src.handlers.fetch_url import FetchWrapper  # noqa: E402
+from src.openai.fake_model import FakeChatModel  # noqa: E402
+
+BUCKET = "benchmark-bucket"
+# resolved by the fixture server acting as proxy, urls of rows must pass URL_PATTERN.
+FIXTURE_HOST = "fixture.test"
+SENTENCE = "Our team helps customers with orders, refunds, delivery and billing questions. "
+
+
+class FixtureHandler(http.server.BaseHTTPRequestHandler):
+    "Serves a page of its own for every path, asked for as a proxy by the fetch client."
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = (
+            f"<html><head><title>{self.path}</title></head><body><main>"
+            f"<h1>Page {self.path}</h1>" + f"<p>{SENTENCE}</p>" * 20 + "</main></body></html>"
+        ).encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_fixture_server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class DictStatusStore:
+    "Stands in for the status collection of a real mongo, keeping only the keys of rows."
+
+    def __init__(self, client=None) -> None:
+        self._rows = set()
+
+    def insert(self, statuses: list):
+        for status in statuses:
+            status.model_dump(by_alias=True)  # serialized all the same, as for an insert
+            self._rows.add((status.doc_id, status.row))
+
+
+class Sampler:
+    "Samples RSS and thread count of the process in background, keeping their peaks."
+
+    def __init__(self, interval: float = 0.05) -> None:
+        self.interval = interval
+        self.rss = 0
+        self.threads = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def sample():
+        try:
+            with open("/proc/self/status") as f:
+                status = dict(line.split(":", 1) for line in f)
+            return int(status["VmRSS"].split()[0]) * 1024, int(status["Threads"])
+
+        except OSError:  # not linux, peak so far is the best available
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+            return rss, threading.active_count()
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss, threads = self.sample()
+            self.rss, self.threads = max(self.rss, rss), max(self.threads, threads)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._stop.set()
+        self._thread.join()
+
+
+def timed_rows(latencies: list):
+    "Records latency of every row, from being picked up to its status, waiting included."
+
+    run = SourceDedup.run
+
+    async def timed(self, source, generate):
+        start = time.perf_counter()
+        try:
+            return await run(self, source, generate)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    SourceDedup.run = timed
+
+
+def make_csv(size: int, url_ratio: float, tag: str):
+    "Rows distinct across runs, so caches of earlier sizes aren't hit."
+
+    urls = int(size * url_ratio)
+    rows = ["source"]
+
+    for i in range(size):
+        if i < urls:
+            rows.append(f"http://{FIXTURE_HOST}/{tag}/page{i}")
+        else:
+            rows.append(f"Row {tag} {i}. " + SENTENCE * 2)
+
+    return ("\n".join(rows) + "\n").encode("utf-8")
+
+
+def percentile(values: list, q: int):
+    if len(values) < 2:
+        return values[0] if values else 0.0
+
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+def bench(client: TestClient, size: int, args, latencies: list):
+    latencies.clear()
+    csv = make_csv(size, args.url_ratio, f"{size}-{time.time_ns()}")
+
+    with Sampler() as sampler:
+        start = time.perf_counter()
+        res = client.post(
+            f"/process?mode={args.mode}", files=[("files", ("bench.csv", csv, "text/csv"))]
+        )
+        elapsed = time.perf_counter() - start
+
+    res.raise_for_status()
+    failed = sum(len(err.get("errs", [])) for err in res.json()["errors"])
+
+    return {
+        "rows": size,
+        "secs": elapsed,
+        "rows_per_sec": size / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "failed": failed,
+        "peak_rss_mb": sampler.rss / 1024 / 1024,
+        "peak_threads": sampler.threads,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="10,100,1000,10000,100000")
+    parser.add_argument("--latency", type=float, default=0.01, help="median secs of llm calls")
+    parser.add_argument("--sigma", type=float, default=0.5, help="spread of llm latencies")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="chance of 500 per call")
+    parser.add_argument("--url-ratio", type=float, default=0.5, help="share of url rows")
+    parser.add_argument("--mode", choices=["turns", "batched"], default="turns")
+    parser.add_argument("--json", help="also write results to this file")
+    parser.add_argument("--verbose", action="store_true", help="keep the logs of the app")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.disable(logging.ERROR)  # failed rows are counted in the results instead
+
+    backends.FakeChatModel = partial(
+        FakeChatModel, latency=args.latency, sigma=args.sigma, error_rates={500: args.error_rate}
+    )
+
+    funcs.StatusStore = DictStatusStore
+    funcs.INTERACTION_CACHE_MONGO = funcs.PAGE_CACHE_MONGO = False
+
+    # a single client for every login, separate mongomock clients don't share their data.
+    mongo = mongomock.MongoClient()
+    mongo_utils.MongoClient = lambda *args, **kwargs: mongo
+
+    server = start_fixture_server()
+    FetchWrapper._client = httpx.AsyncClient(
+        proxy=f"http://127.0.0.1:{server.server_port}", follow_redirects=True
+    )
+
+    latencies = []
+    timed_rows(latencies)
+    results = []
+
+    with mock_aws(), TestClient(app) as client:
+        boto3.client("s3", region_name="us-east-1").create_bucket(Bucket=BUCKET)
+        res = client.post(
+            "/login",
+            json={
+                "mongo_url": "mongodb://localhost:27017/",
+                "s3_params": {
+                    "access_key": "benchmark",
+                    "secret_access_key": "benchmark",
+                    "region": "us-east-1",
+                    "bucket_name": BUCKET,
+                },
+            },
+        )
+        res.raise_for_status()
+
+        print(
+            f"{'rows':>8}{'secs':>10}{'rows/s':>10}{'p50 ms':>10}{'p95 ms':>10}"
+            f"{'p99 ms':>10}{'failed':>8}{'rss MB':>9}{'threads':>9}"
+        )
+        for size in map(int, args.sizes.split(",")):
+            result = bench(client, size, args, latencies)
+            results.append(result)
+            print(
+                f"{result['rows']:>8}{result['secs']:>10.2f}{result['rows_per_sec']:>10.1f}"
+                f"{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}{result['p99_ms']:>10.1f}"
+                f"{result['failed']:>8}{result['peak_rss_mb']:>9.1f}{result['peak_threads']:>9}",
+                flush=True,
+            )
+
+    server.shutdown()
+
+    if args.json is not None:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
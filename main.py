@@ -2,18 +2,33 @@ from typing import Annotated, Optional
 
 from fastapi import Depends, FastAPI, Query, Response, UploadFile, status
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from mangum import Mangum
 
+from src.defaults import (
+    GENERATION_MODE,
+    JOB_EXECUTION,
+    JOB_ROWS_MAX_PAGE_SIZE,
+    JOB_ROWS_PAGE_SIZE,
+    SOURCE_CHUNKING,
+)
 from src.exceptions import BaseAppException
 from src.exceptions.cookie_exceptions import CookieException
 from src.handlers import (
+    ExecutionModes,
+    GenerationModes,
     PostData,
+    RequestContext,
+    SourceChunking,
     cookie_dependency,
     delete_cookie,
+    get_job,
     openai_params_dependency,
     process_files,
+    resume_job,
     set_cookie,
+    stream_files,
+    submit_job,
 )
 from src.logging import logger
 
@@ -43,17 +58,82 @@ def logout_route(res: Response):
     return delete_cookie(res)
 
 
-@app.post(
-    "/process",
-    tags=["Main"],
-    dependencies=[Depends(cookie_dependency), Depends(openai_params_dependency)],
-)
-async def process_route(files: list[UploadFile], column: Annotated[Optional[str], Query()] = None):
+@app.post("/process", tags=["Main"])
+async def process_route(
+    files: list[UploadFile],
+    ctx: Annotated[RequestContext, Depends(openai_params_dependency)],
+    column: Annotated[Optional[str], Query()] = None,
+    mode: Annotated[GenerationModes, Query()] = GENERATION_MODE,
+    chunking: Annotated[SourceChunking, Query()] = SOURCE_CHUNKING,
+):
     """
     Process route that takes a list of csv files of data with
-    optional column name to pick column if multiple columns are there."""
+    optional column name to pick column if multiple columns are there.
+    `batched` mode generates each conversation in a single call, using far less tokens.
+    Sources over the token budget are truncated, or split into chunks
+    each generating its own interactions with `chunk` chunking."""
+
+    return await process_files(files, ctx, column, mode, chunking)
+
+
+@app.post("/process/stream", tags=["Main"])
+async def process_stream_route(
+    files: list[UploadFile],
+    ctx: Annotated[RequestContext, Depends(openai_params_dependency)],
+    column: Annotated[Optional[str], Query()] = None,
+    mode: Annotated[GenerationModes, Query()] = GENERATION_MODE,
+    chunking: Annotated[SourceChunking, Query()] = SOURCE_CHUNKING,
+    turns: Annotated[bool, Query()] = False,
+):
+    """
+    Same as process route, but streams a NDJSON line for each row as soon as it's done,
+    and for each file once it's done. `turns` adds a line for each turn of the conversations.
+    Last line carries the same result as process route, or the error it failed with."""
+
+    events = await stream_files(files, ctx, column, mode, chunking, turns)
+    return StreamingResponse(events, media_type="application/x-ndjson")
+
+
+@app.post("/jobs", tags=["Main"])
+async def submit_job_route(
+    files: list[UploadFile],
+    ctx: Annotated[RequestContext, Depends(openai_params_dependency)],
+    column: Annotated[Optional[str], Query()] = None,
+    mode: Annotated[GenerationModes, Query()] = GENERATION_MODE,
+    chunking: Annotated[SourceChunking, Query()] = SOURCE_CHUNKING,
+    execution: Annotated[ExecutionModes, Query()] = JOB_EXECUTION,
+):
+    """
+    Same as process route, but the files are processed in background
+    and the job id is returned right away to poll the job with.
+    `batch` execution sends the calls through OpenAI Batch API, at half the price
+    but taking up to a day for each turn of the conversations."""
+
+    return await submit_job(files, ctx, column, mode, chunking, execution)
+
+
+@app.post("/jobs/{job_id}/resume", tags=["Main"])
+async def resume_job_route(job_id: str, ctx: Annotated[RequestContext, Depends(cookie_dependency)]):
+    """
+    Resumes a job left unfinished by a server that went down, from its last completed row.
+    Calling it on a running job adds this server's workers to it."""
+
+    return await resume_job(job_id, ctx)
+
+
+@app.get("/jobs/{job_id}", tags=["Main"])
+def get_job_route(
+    job_id: str,
+    ctx: Annotated[RequestContext, Depends(cookie_dependency)],
+    failed: Annotated[bool, Query()] = False,
+    offset: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[int, Query(ge=1, le=JOB_ROWS_MAX_PAGE_SIZE)] = JOB_ROWS_PAGE_SIZE,
+):
+    """
+    Job state along with the progress of each of its files, row by row. Rows are paged
+    with `offset` and `limit`, `failed` returns only the failed ones with their reasons."""
 
-    return await process_files(files, column)
+    return get_job(job_id, ctx, failed, offset, limit)
 
 
 @app.exception_handler(CookieException)
@@ -0,0 +1,216 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Hashable
+
+from .defaults import CLIENT_CACHE_SIZE, CLIENT_CACHE_TTL, CLIENT_REVALIDATE_INTERVAL
+from .exceptions import BaseAppException
+from .logging import logger
+
+log = logger(__name__)
+
+
+class LRUCache:
+    "Bounded in-process cache evicting least recently used entries, with optional expiry."
+
+    def __init__(
+        self, size: int, ttl: float = None, on_evict: Callable[[Any], None] = None
+    ) -> None:
+        self.size = size
+        self.ttl = ttl
+        self.on_evict = on_evict  # called with values dropped for size or expiry
+        self._data: OrderedDict[Hashable, tuple[Any, float]] = OrderedDict()
+        self._lock = threading.Lock()  # shared with the threads running sync handlers
+
+    def _evicted(self, values: list):
+        if self.on_evict is not None:
+            for value in values:
+                self.on_evict(value)
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+
+            value, expires_at = entry
+            expired = expires_at is not None and expires_at <= time.monotonic()
+            if expired:
+                del self._data[key]
+            else:
+                self._data.move_to_end(key)
+
+        if expired:
+            self._evicted([value])
+            return default
+
+        return value
+
+    def set(self, key: Hashable, value, ttl: float = None):
+        if ttl is None:
+            ttl = self.ttl
+
+        expires_at = None if ttl is None else time.monotonic() + ttl
+
+        evicted = []
+
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.size:
+                evicted.append(self._data.popitem(last=False)[1][0])
+
+        self._evicted(evicted)
+
+    def pop(self, key: Hashable, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+
+        return default if entry is None else entry[0]
+
+    def __len__(self):
+        return len(self._data)
+
+
+class TieredCache:
+    "In-process LRU in front of an optional slower store like mongo, only logging store failures."
+
+    def __init__(self, memory: LRUCache, store=None) -> None:
+        self._memory = memory
+        self._store = store
+
+    async def get(self, key: str):
+        value = self._memory.get(key)
+        if value is not None or self._store is None:
+            return value
+
+        try:
+            value = await asyncio.to_thread(self._store.get, key)
+        except BaseAppException:
+            log.warning("Failed to read from %s store.", type(self).__name__)
+            return None
+
+        if value is not None:
+            self._memory.set(key, value)
+
+        return value
+
+    async def set(self, key: str, value):
+        self._memory.set(key, value)
+
+        if self._store is None:
+            return
+
+        try:
+            await asyncio.to_thread(self._store.set, key, value)
+        except BaseAppException:
+            log.warning("Failed to write to %s store.", type(self).__name__)
+
+
+class ClientCache:
+    """
+    Clients kept per credentials, created and fully validated only once. Clients idle
+    for `revalidate` seconds are checked with a cheap call before reuse and recreated on failure.
+    Clients held by long running work are closed only once the last one holding them is done."""
+
+    def __init__(
+        self,
+        create: Callable[..., Any],
+        check: Callable[..., None],
+        close: Callable[[Any], None] = None,
+        size: int = CLIENT_CACHE_SIZE,
+        ttl: float = CLIENT_CACHE_TTL,
+        revalidate: float = CLIENT_REVALIDATE_INTERVAL,
+    ) -> None:
+        self._create = create
+        self._check = check
+        self._close = close
+        self.revalidate = revalidate
+
+        self._clients = LRUCache(size, ttl, on_evict=self._discard)
+        # reentrant, as setting a client may evict another one while it's held.
+        self._lock = threading.RLock()
+        self._holds: dict[int, list] = {}  # id of client -> [client, holds, discarded]
+
+    def _discard(self, entry: list):
+        with self._lock:
+            held = self._holds.get(id(entry[0]))
+            if held is not None:
+                held[2] = True  # closed by its last release instead
+                return
+
+        if self._close is not None:
+            self._close(entry[0])
+
+    def hold(self, client):
+        with self._lock:
+            held = self._holds.setdefault(id(client), [client, 0, False])
+            held[1] += 1
+
+    def release(self, client):
+        with self._lock:
+            held = self._holds[id(client)]
+            held[1] -= 1
+            if held[1] > 0:
+                return
+
+            del self._holds[id(client)]
+
+        if held[2] and self._close is not None:
+            self._close(client)
+
+    @contextmanager
+    def holding(self, client):
+        "Keeps client open while in the block, even if it's evicted meanwhile."
+
+        self.hold(client)
+        try:
+            yield client
+        finally:
+            self.release(client)
+
+    @staticmethod
+    def key(*creds):
+        # hashed, so the credentials aren't kept around any more than in the clients.
+        return hashlib.sha256(json.dumps(creds, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get(self, *creds):
+        "Client for the credentials, `creds` are passed to `create` and `check` as they are."
+
+        key = self.key(*creds)
+        entry = self._clients.get(key)
+
+        if entry is not None:
+            client, checked_at = entry
+            if time.monotonic() - checked_at < self.revalidate:
+                return client
+
+            try:
+                self._check(client, *creds)
+            except BaseAppException:
+                log.warning("Cached client failed the check, creating a new one.")
+                if self._clients.pop(key) is not None:
+                    self._discard(entry)
+            else:
+                entry[1] = time.monotonic()
+                self._clients.set(key, entry)  # extends its expiry as well
+                return client
+
+        client = self._create(*creds)
+
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry is None:
+                self._clients.set(key, [client, time.monotonic()])
+                return client
+
+        # created meanwhile by another thread for the same credentials.
+        if self._close is not None:
+            self._close(client)
+
+        return entry[0]
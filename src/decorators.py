@@ -1,15 +1,70 @@
+import asyncio
 import functools
+import inspect
+import random
 import time
-from typing import Callable, Iterable
-
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Iterable, Optional
+
+from .defaults import (
+    RETRY_ATTEMPTS,
+    RETRY_BASE_DELAY,
+    RETRY_BUDGET_MIN,
+    RETRY_BUDGET_RATIO,
+    RETRY_MAX_DELAY,
+)
 from .logging import logger
 
 log = logger(__name__)
 
 
+def _find_handler(errs: dict, e: Exception):
+    for cls in type(e).__mro__:  # check all parent classes of error for handler
+        if cls in errs:
+            return errs[cls]
+
+    return None
+
+
 def handle_errors(errs: dict[Exception, Callable[[Exception], Exception]]):
 
     def decorator(func):
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                try:
+                    return await func(*args, **kwargs)
+                except Exception as e:
+                    log.exception("Caught this err in decorator..")
+
+                    handler = _find_handler(errs, e)
+                    if handler is not None:
+                        raise handler(e)
+
+                    raise e  # re raise the error to handle on main app
+
+            return async_wrapper
+
+        if inspect.isgeneratorfunction(func):
+
+            @functools.wraps(func)
+            def gen_wrapper(*args, **kwargs):
+                try:
+                    return (yield from func(*args, **kwargs))
+                except Exception as e:
+                    log.exception("Caught this err in decorator..")
+
+                    handler = _find_handler(errs, e)
+                    if handler is not None:
+                        raise handler(e)
+
+                    raise e  # re raise the error to handle on main app
+
+            return gen_wrapper
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
             try:
@@ -17,9 +72,9 @@ def handle_errors(errs: dict[Exception, Callable[[Exception], Exception]]):
             except Exception as e:
                 log.exception("Caught this err in decorator..")
 
-                for cls in type(e).__mro__:  # check all parent classes of error for handler
-                    if cls in errs:
-                        raise errs[cls](e)
+                handler = _find_handler(errs, e)
+                if handler is not None:
+                    raise handler(e)
 
                 raise e  # re raise the error to handle on main app
 
@@ -28,33 +83,129 @@ def handle_errors(errs: dict[Exception, Callable[[Exception], Exception]]):
     return decorator
 
 
-def retry(errs: Iterable[Exception], retry: int = 2, delay: float = 1.7):
-    errs = set(errs)
+class RetryBudget:
+    """
+    Allows retries of a request only up to a ratio of its calls, so synchronized
+    retries during an outage can't multiply the load on the upstream services."""
+
+    def __init__(self, ratio: float = RETRY_BUDGET_RATIO, minimum: float = RETRY_BUDGET_MIN):
+        self._ratio = ratio
+        self._tokens = minimum
+
+    def deposit(self):
+        self._tokens += self._ratio
+
+    def withdraw(self):
+        if self._tokens < 1:
+            return False
+
+        self._tokens -= 1
+        return True
+
+
+retry_budget: ContextVar[Optional[RetryBudget]] = ContextVar("retry_budget", default=None)
+
+
+def _retry_after(e: Exception):
+    res = getattr(e, "response", None)
+    headers = getattr(res, "headers", None)  # httpx based responses like openai and httpx
+
+    if headers is None and isinstance(res, dict):  # botocore client errors
+        headers = res.get("ResponseMetadata", {}).get("HTTPHeaders")
+
+    if not headers:
+        return None
+
+    try:
+        ms = headers.get("retry-after-ms")
+        if ms is not None:
+            return max(0.0, float(ms) / 1000)
+
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+
+        if value.isdigit():
+            return float(value)
+
+        date = parsedate_to_datetime(value)
+        return max(0.0, (date - datetime.now(timezone.utc)).total_seconds())
+
+    except (TypeError, ValueError):
+        return None
+
+
+def retry(
+    errs: Iterable[Exception],
+    retry: int = RETRY_ATTEMPTS,
+    delay: float = RETRY_BASE_DELAY,
+    max_delay: float = RETRY_MAX_DELAY,
+):
+    "Retries with exponential backoff and full jitter, honoring `Retry-After` if server sent it."
+
+    errs = dict.fromkeys(errs, True)
+
+    def backoff(func, e: Exception, attempt: int):
+        "Returns secs to sleep before next attempt or None to give up."
+
+        if attempt >= retry - 1 or _find_handler(errs, e) is None:
+            return None
+
+        sleep = random.uniform(0, min(max_delay, delay * 2**attempt))
+
+        retry_after = _retry_after(e)
+        if retry_after is not None:
+            if retry_after > max_delay:
+                return None
+
+            sleep = max(sleep, retry_after)
+
+        budget = retry_budget.get()
+        if budget is not None and not budget.withdraw():
+            log.warning("Retry budget exhausted, not retrying func '%s'", func.__name__)
+            return None
+
+        log.info("Sleeping on func '%s' for %.2f secs", func.__name__, sleep)
+        return sleep
+
+    def deposit():
+        budget = retry_budget.get()
+        if budget is not None:
+            budget.deposit()
 
     def decorator(func):
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                deposit()
+
+                for attempt in range(retry):
+                    try:
+                        return await func(*args, **kwargs)
+                    except Exception as e:
+                        sleep = backoff(func, e, attempt)
+                        if sleep is None:
+                            raise e  # re raise the error to handle on main app
+
+                        await asyncio.sleep(sleep)
+
+            return async_wrapper
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            is_processed, is_matched = False, False
+            deposit()
 
             for attempt in range(retry):
                 try:
                     return func(*args, **kwargs)
                 except Exception as e:
-                    if not is_processed:
-                        is_processed = True
-
-                        # check all parent classes of error for retrying
-                        for cls in type(e).__mro__:
-                            if cls in errs:
-                                is_matched = True
-                                break
-
-                    if is_matched and attempt < retry:
-                        log.info("Sleeping on func '%s' for %s secs", func.__name__, delay)
-                        time.sleep(delay)
-                    else:
+                    sleep = backoff(func, e, attempt)
+                    if sleep is None:
                         raise e  # re raise the error to handle on main app
 
+                    time.sleep(sleep)
+
         return wrapper
 
     return decorator
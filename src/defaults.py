@@ -2,15 +2,109 @@ CHAT_MODEL_NAME = "gpt-4o-mini"
 CHAT_MODEL_TEMPERATURE = 0.5
 CHAT_MODEL_MAX_TOKENS = 950
 
+OPENAI_MAX_CONNECTIONS = 1000
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = 200
+# starting point for pacing, corrected from the rate limit headers once responses arrive.
+OPENAI_REQUESTS_PER_MINUTE = 500
+OPENAI_TOKENS_PER_MINUTE = 200_000
+
+# "openai", "compatible" for servers with OpenAI compatible API at `LLM_BASE_URL` env, or
+# "fake" generating responses in process for offline load tests. `LLM_BACKEND` env overrides it.
+LLM_BACKEND = "openai"
+FAKE_LATENCY = 0.8  # median secs of fake calls, log-normally distributed
+FAKE_LATENCY_SIGMA = 0.5
+FAKE_ERROR_RATES = {429: 0.0, 500: 0.0}  # chance of fake calls failing with each status
+FAKE_SEED = 0
+
+# batch jobs gather calls made around the same time into a single batch, each turn of the
+# conversations being a round of its own. A round is sent once no call came for BATCH_LINGER.
+BATCH_LINGER = 5
+BATCH_MAX_WAIT = 60
+BATCH_MAX_REQUESTS = 50_000  # limit of OpenAI per batch
+BATCH_MAX_BYTES = 190 * 1024 * 1024  # input file limit of OpenAI is 200 MB, kept under it
+BATCH_MAX_ROWS = 10_000  # rows of batch jobs in flight across the process
+BATCH_POLL_INTERVAL = 30
+BATCH_COMPLETION_WINDOW = "24h"
+JOB_EXECUTION = "realtime"
+JOB_ROWS_PAGE_SIZE = 100  # rows of each file returned by a poll of job
+JOB_ROWS_MAX_PAGE_SIZE = 1000
+
 MAX_FETCH_LENGTH = 650 * 1024
+# keep first MAX_FETCH_LENGTH bytes of larger pages instead of failing them.
+FETCH_TRUNCATE_OVERSIZED = False
+FETCH_MAX_CONNECTIONS = 200
+FETCH_MAX_KEEPALIVE_CONNECTIONS = 100
+FETCH_MAX_CONNECTIONS_PER_HOST = 8
+FETCH_KEEPALIVE_EXPIRY = 30
+FETCH_HTTP2 = True  # only if `h2` package is installed
+
+# "lxml" strips boilerplate like navigation and cookie banners, "soup" keeps whole body text.
+HTML_EXTRACTOR = "lxml"
+MAIN_CONTENT_ONLY = False  # extract only <main> or <article> if page has one
+
+PAGE_CACHE_SIZE = 512
+PAGE_CACHE_TTL = 7 * 24 * 60 * 60
+PAGE_CACHE_FRESH_TTL = 60 * 60  # pages older than this are revalidated with the server
+PAGE_CACHE_MONGO = True
 MIN_DATA_LENGTH = 62
 
 MAX_INTERACTIONS = 4
 
+# sources larger than this are either truncated or split into chunks before prompting.
+SOURCE_TOKEN_BUDGET = 12_000
+SOURCE_CHUNKING = "truncate"
+MAX_SOURCE_CHUNKS = 4
+# "turns" asks one question per call, "batched" asks for the whole conversation in one call.
+GENERATION_MODE = "turns"
+
+# rows being generated at once, across the whole process, per cookie session and per file.
+MAX_CONCURRENT_GENERATIONS = 256
+MAX_SESSION_GENERATIONS = 64
+MAX_FILE_GENERATIONS = 32  # workers per file
+ROW_QUEUE_SIZE = 64  # rows read ahead of the workers
+DEDUP_CACHE_SIZE = 4096  # distinct sources of a request whose generation is shared by repeats
+STREAM_QUEUE_SIZE = 256  # events held for a slow streaming client, generation waits once full
+MAX_BACKGROUND_JOBS = 4  # jobs submitted to /jobs run at once, rest wait in queue
+
+# rows of jobs are leased from a work queue, "memory" keeps it in process for local runs.
+WORK_QUEUE = "mongo"
+WORK_LEASE_DURATION = 5 * 60  # renewed while rows are processed, expires once worker dies
+WORK_MAX_ATTEMPTS = 3
+WORK_POLL_INTERVAL = 5  # wait for rows leased by other workers to finish or expire
+WORK_PUT_BATCH = 500
+
+# statuses of finished rows are written in batches of this size, or at least this often.
+STATUS_BATCH_SIZE = 100
+STATUS_FLUSH_INTERVAL = 2
+
+RETRY_ATTEMPTS = 3
+RETRY_BASE_DELAY = 0.8
+RETRY_MAX_DELAY = 20
+# every call earns the request a fraction of a retry on top of the minimum ones.
+RETRY_BUDGET_RATIO = 0.2
+RETRY_BUDGET_MIN = 10
+
+INTERACTION_CACHE_SIZE = 2048
+INTERACTION_CACHE_TTL = 7 * 24 * 60 * 60
+INTERACTION_CACHE_MONGO = True
+
 COOKIE_DURATION = 16 * 60 * 60
+COOKIE_CACHE_SIZE = 1024  # decrypted cookies kept for the sessions in use
+
+# mongo clients and s3 sessions reused across requests made with same credentials.
+CLIENT_CACHE_SIZE = 64
+CLIENT_CACHE_TTL = 60 * 60  # dropped once unused for this long
+CLIENT_REVALIDATE_INTERVAL = 60  # checked with a ping before reuse once idle for this long
+CLIENT_CLOSE_DELAY = 5 * 60  # evicted clients are closed later, requests may still be using them
 
 MONGO_CONNECTION_TIMEOUT = 3000
 MONGO_DB_NAME = "synthetic_data_db"
 MONGO_COL_NAME = "synthetic_data_col"
+MONGO_STATUS_COL_NAME = "generation_status_col"
+MONGO_CACHE_COL_NAME = "interaction_cache_col"
+MONGO_PAGE_CACHE_COL_NAME = "page_cache_col"
+MONGO_JOB_COL_NAME = "job_col"
+MONGO_QUEUE_COL_NAME = "work_queue_col"
 
 S3_UPLOAD_FOLDER = "synthetic_data_generation"
+S3_PART_SIZE = 8 * 1024 * 1024  # S3 needs at least 5MB for every part except last one
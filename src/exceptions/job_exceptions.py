@@ -0,0 +1,9 @@
+from . import BaseAppException
+
+
+class JobException(BaseAppException):
+    "Base Exception for background job related issues."
+
+
+class JobNotResumable(JobException):
+    "Exception raised when a job can't be resumed from the work queue."
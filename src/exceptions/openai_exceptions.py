@@ -51,3 +51,7 @@ class NotFoundException(OpenAIException):
 
 class ConflictException(OpenAIException):
     "Exception raised for conflicted requests with OpenAI."
+
+
+class BatchException(OpenAIException):
+    "Exception raised for requests that failed or weren't completed within their batch."
@@ -1,12 +1,23 @@
+from .context import RequestContext
 from .dependencies import cookie_dependency, openai_params_dependency
 from .funcs import delete_cookie, process_files, set_cookie
-from .models import PostData
+from .jobs import get_job, resume_job, submit_job
+from .models import ExecutionModes, GenerationModes, PostData, SourceChunking
+from .stream import stream_files
 
 __all__ = (
+    "GenerationModes",
+    "ExecutionModes",
+    "SourceChunking",
     "PostData",
+    "RequestContext",
     "set_cookie",
     "delete_cookie",
     "process_files",
+    "stream_files",
+    "submit_job",
+    "resume_job",
+    "get_job",
     "cookie_dependency",
     "openai_params_dependency",
 )
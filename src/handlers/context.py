@@ -0,0 +1,33 @@
+import boto3
+from pymongo import MongoClient
+
+from ..s3.bucket import Bucket
+from .models import OpenAIParams
+
+
+class RequestContext:
+    """
+    Clients and params of a request, built from its cookie and query by the dependencies
+    and passed along to everything it runs, so concurrent requests don't share any of them."""
+
+    def __init__(
+        self,
+        session_key: str,
+        client: MongoClient,
+        session: boto3.Session,
+        bucket_name: str,
+        params: OpenAIParams = None,
+        owner_key: str = None,
+    ) -> None:
+        if params is None:
+            params = OpenAIParams()
+
+        self.session_key = session_key
+        self.client = client
+        self.session = session
+        self.bucket_name = bucket_name
+        self.params = params
+        self.owner_key = owner_key  # of the credentials, outlives the cookie unlike session key
+
+    def bucket(self):
+        return Bucket(self.session, self.bucket_name)
@@ -1,5 +1,6 @@
+import codecs
 import csv
-from io import BytesIO, StringIO, TextIOWrapper
+from io import StringIO
 
 from fastapi import UploadFile
 
@@ -11,24 +12,24 @@ from ..exceptions.csv_exceptions import (
 )
 
 
-def convert_to_actual_file(f):
-    return BytesIO(f.read())
-
-
 class CSVFile:
     @handle_errors({csv.Error: lambda _: CSVException("Error occured while opening csv file.")})
     def __init__(self, file: UploadFile, col: str = None) -> None:
         if file.filename is None or not file.filename.lower().endswith(".csv"):
             raise InvalidCSVException(f"Invalid csv file with name '{file.filename}'")
 
-        f = TextIOWrapper(
-            convert_to_actual_file(file.file)
-        )  # its a binary file , so need to convert to text file
-        self._csv = csv.DictReader(f)
+        # decoding the binary spooled file line by line, instead of reading it whole in memory.
+        lines = codecs.iterdecode(file.file, "utf-8")
+        self._csv = csv.DictReader(lines)
         self.col = col
         self.is_empty = True
 
-    @handle_errors({csv.Error: lambda _: CSVException("Error occured while reading csv file.")})
+    @handle_errors(
+        {
+            csv.Error: lambda _: CSVException("Error occured while reading csv file."),
+            UnicodeDecodeError: lambda _: CSVException("CSV file must be utf-8 encoded."),
+        }
+    )
     def iterate(self):
         for row in self._csv:
             row.pop(None, None)
@@ -73,5 +74,10 @@ class CSVOutFile:
     def write(self, content: list[str]):
         self._csv.writerow(dict(zip(self.cols, content)))
 
-    def finish(self):
-        return self._file
+    def drain(self):
+        "Returns the encoded rows written since last drain."
+
+        data = self._file.getvalue().encode("utf-8")
+        self._file.seek(0)
+        self._file.truncate()
+        return data
@@ -0,0 +1,56 @@
+import asyncio
+import hashlib
+from typing import Awaitable, Callable
+
+from ..cache import LRUCache
+from ..defaults import DEDUP_CACHE_SIZE
+from ..mongo.model import GenerationStatus
+from ..mongo.utils import make_id
+from .fetch_url import FetchWrapper
+from .page_cache import normalize_url
+
+
+def source_key(source: str):
+    "Same key for urls differing only in spelling, and for texts differing only in whitespace."
+
+    if FetchWrapper.is_url(source):
+        return "url:" + normalize_url(source)
+
+    if FetchWrapper.is_url("http://" + source):
+        return "url:" + normalize_url("http://" + source)
+
+    text = " ".join(source.split())
+    return "text:" + hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class SourceDedup:
+    """
+    Runs a single generation for each distinct source of a request, rows repeating a source
+    get a copy of its status. Bounded, so a repeat coming long after may be generated again."""
+
+    def __init__(self, size: int = DEDUP_CACHE_SIZE) -> None:
+        self._generations = LRUCache(size)
+
+    async def run(self, source: str, generate: Callable[[], Awaitable[GenerationStatus]]):
+        key = source_key(source)
+
+        entry = self._generations.get(key)
+        if entry is None:
+            entry = [asyncio.ensure_future(generate()), 0]  # task, rows waiting on it
+            self._generations.set(key, entry)
+
+        task = entry[0]
+        entry[1] += 1
+
+        try:
+            # shielded, so a row cancelled while waiting doesn't cancel it for the other rows.
+            status = await asyncio.shield(task)
+
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not task.done():
+                task.cancel()  # no row is left waiting on it
+                if self._generations.get(key) is entry:
+                    self._generations.pop(key)
+
+        return status.model_copy(update={"id": make_id(), "source": source})
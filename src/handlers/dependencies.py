@@ -1,22 +1,48 @@
+import hashlib
 from typing import Annotated, Optional
 
-from fastapi import Cookie, HTTPException, Query, status
+from fastapi import Cookie, Depends, HTTPException, Query, status
 
-from ..mongo.db import Database
-from ..mongo.utils import ensure_connection
-from ..openai.chat_model import ChatModel
-from ..s3.bucket import Bucket
-from ..s3.utils import ensure_session
+from ..cache import LRUCache
+from ..defaults import COOKIE_CACHE_SIZE
+from ..mongo.utils import get_connection
+from ..s3.utils import get_session
+from .context import RequestContext
 from .encrypted_cookie import EncryptedCookie
 from .models import CookieData, OpenAIParams
 
+_cookies = LRUCache(COOKIE_CACHE_SIZE)
 
-def utilise_cookie(data: CookieData):
-    client = ensure_connection(data.mongo_url)
-    Database.set_connection(client)
 
-    session = ensure_session(data.s3_params)
-    Bucket.set_bucket_session(session, data.s3_params.bucket_name)
+def owner_key(data: CookieData):
+    "Same for every login with the same credentials, unlike the session key of each cookie."
+
+    return hashlib.sha256(data.model_dump_json().encode("utf-8")).hexdigest()
+
+
+def utilise_cookie(data: CookieData, session_key: str):
+    return RequestContext(
+        session_key,
+        get_connection(data.mongo_url),
+        get_session(data.s3_params),
+        data.s3_params.bucket_name,
+        owner_key=owner_key(data),
+    )
+
+
+def read_cookie(sid: str):
+    "Decrypted cookie data, kept until the cookie expires so hot sessions skip decryption."
+
+    # session key to group the requests made with same cookie, without keeping the cookie itself.
+    session_key = hashlib.sha256(sid.encode("utf-8")).hexdigest()
+
+    data = _cookies.get(session_key)
+    if data is None:
+        cookie = EncryptedCookie.get_default()
+        data = cookie.decrypt(sid)
+        _cookies.set(session_key, data, cookie.expires_in(sid))
+
+    return session_key, data
 
 
 def cookie_dependency(sid: Annotated[Optional[str], Cookie(include_in_schema=False)] = None):
@@ -25,10 +51,13 @@ def cookie_dependency(sid: Annotated[Optional[str], Cookie(include_in_schema=Fal
             status.HTTP_401_UNAUTHORIZED, "Valid cookie not found, make sure to login first."
         )
 
-    cookie = EncryptedCookie()
-    data = cookie.decrypt(sid)
-    utilise_cookie(data)
+    session_key, data = read_cookie(sid)
+    return utilise_cookie(data, session_key)
 
 
-def openai_params_dependency(model_params: Annotated[OpenAIParams, Query()]):
-    ChatModel.set_params(model_params)
+def openai_params_dependency(
+    ctx: Annotated[RequestContext, Depends(cookie_dependency)],
+    model_params: Annotated[OpenAIParams, Query()],
+):
+    ctx.params = model_params
+    return ctx
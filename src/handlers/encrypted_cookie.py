@@ -16,6 +16,8 @@ from .models import CookieData
 
 
 class EncryptedCookie:
+    _default: "EncryptedCookie" = None
+
     @handle_errors(
         {ValueError: lambda _: ConfigException("Provided key for cookie encryption is invalid.")}
     )
@@ -28,6 +30,28 @@ class EncryptedCookie:
 
         self._encrypter = Fernet(key)
 
+    @classmethod
+    def get_default(cls):
+        "Shared instance using the key from env, instead of building a new one per request."
+
+        if cls._default is None:
+            cls._default = cls()
+
+        return cls._default
+
+    @handle_errors(
+        {
+            InvalidToken: lambda _: InvalidCookieException(
+                "Cookie data is invalid, Signature verification failed."
+            )
+        }
+    )
+    def expires_in(self, data: str):
+        "Seconds left before cookie expires, read from its timestamp without decrypting it."
+
+        time = self._encrypter.extract_timestamp(data)
+        return COOKIE_DURATION - (datetime.now() - datetime.fromtimestamp(time)).total_seconds()
+
     @handle_errors(
         {
             InvalidToken: lambda _: InvalidCookieException(
@@ -39,8 +63,7 @@ class EncryptedCookie:
         }
     )
     def decrypt(self, data: str) -> CookieData:
-        time = self._encrypter.extract_timestamp(data)
-        if (datetime.now() - datetime.fromtimestamp(time)).total_seconds() >= COOKIE_DURATION:
+        if self.expires_in(data) <= 0:
             raise CookieExpiredException("Cookie is expired.")
 
         data = self._encrypter.decrypt(data)
@@ -0,0 +1,126 @@
+import re
+
+import lxml.html
+from bs4 import BeautifulSoup
+from lxml import etree
+
+from ..defaults import HTML_EXTRACTOR, MAIN_CONTENT_ONLY
+from ..exceptions.fetch_exceptions import ContentNotFound
+
+BOILERPLATE_XPATH = (
+    "//script | //style | //noscript | //template | //svg | //iframe"
+    # only search and login forms, pages like ASP.NET ones wrap their whole body in a form.
+    " | //form[@role='search' or .//input[@type='search' or @type='password']]"
+    " | //nav | //aside | //*[@role='navigation'] | //*[@aria-hidden='true']"
+    # page level header and footer only, the ones of an article are part of its content.
+    " | //header[not(ancestor::main or ancestor::article)]"
+    " | //footer[not(ancestor::main or ancestor::article)]"
+)
+MAIN_CONTENT_XPATH = "//main | //article | //*[@role='main']"
+
+# matched against whole words of id and class, so `shareholders` isn't taken for `share`.
+BOILERPLATE_PATTERN = re.compile(
+    r"(?:^|[\s_-])(?:cookie\w*|consent|gdpr|newsletter|popup|modal|breadcrumbs?|skip-link"
+    r"|share|social)(?=$|[\s_-])",
+    re.IGNORECASE,
+)
+
+BLOCK_TAGS = frozenset(
+    (
+        "address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt",
+        "fieldset", "figcaption", "figure", "footer", "h1", "h2", "h3", "h4", "h5", "h6",
+        "header", "hr", "li", "main", "ol", "p", "pre", "section", "table", "td", "th",
+        "tr", "ul",
+    )
+)  # fmt: skip
+
+
+class SoupExtractor:
+    "Whole text of body using BeautifulSoup, one line per text node."
+
+    def extract(self, content: bytes):
+        soup = BeautifulSoup(content, "lxml")
+        if soup.body is None:
+            raise ContentNotFound("No content found in the URL.")
+
+        return soup.body.get_text("\n", True).strip()
+
+
+class LxmlExtractor:
+    """
+    Text of body using lxml directly, skipping boilerplate like scripts, navigation,
+    page footers and cookie banners, with one line per block and repeated lines removed."""
+
+    def __init__(self, main_content_only: bool = MAIN_CONTENT_ONLY) -> None:
+        self.main_content_only = main_content_only
+
+    @staticmethod
+    def _is_boilerplate(el):
+        attrs = el.get("id", "") + " " + el.get("class", "")
+        return BOILERPLATE_PATTERN.search(attrs) is not None
+
+    @staticmethod
+    def _text(root):
+        parts = []
+
+        for event, el in etree.iterwalk(root, events=("start", "end")):
+            is_element = isinstance(el.tag, str)  # comments and processing instructions aren't
+
+            if event == "start":
+                if is_element and el.tag in BLOCK_TAGS:
+                    parts.append("\n")
+
+                if is_element and el.text:
+                    parts.append(el.text)
+
+            else:
+                if is_element and el.tag in BLOCK_TAGS:
+                    parts.append("\n")
+
+                if el.tail and el is not root:
+                    parts.append(el.tail)
+
+        return "".join(parts)
+
+    def extract(self, content: bytes):
+        try:
+            body = lxml.html.document_fromstring(content).body
+        except (etree.ParserError, ValueError):
+            body = None
+
+        if body is None:
+            raise ContentNotFound("No content found in the URL.")
+
+        for el in body.xpath(BOILERPLATE_XPATH):
+            el.drop_tree()
+
+        for el in body.xpath("//body//*[@id or @class]"):
+            if self._is_boilerplate(el):
+                el.drop_tree()
+
+        root = body
+        if self.main_content_only:
+            main = body.xpath(MAIN_CONTENT_XPATH)
+            if len(main) > 0:
+                root = main[0]
+
+        lines, seen = [], set()
+        for line in self._text(root).split("\n"):
+            line = " ".join(line.split())
+            if line == "" or line in seen:
+                continue
+
+            seen.add(line)
+            lines.append(line)
+
+        return "\n".join(lines)
+
+
+extractors = {
+    "soup": SoupExtractor,
+    "lxml": LxmlExtractor,
+}
+
+
+def get_extractor(name: str = HTML_EXTRACTOR):
+    return extractors[name]()
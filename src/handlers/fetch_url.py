@@ -1,7 +1,7 @@
+import asyncio
 import re
 
 import httpx
-from bs4 import BeautifulSoup
 from httpx import (
     DecodingError,
     HTTPError,
@@ -12,8 +12,17 @@ from httpx import (
     TimeoutException,
 )
 
+from ..cache import LRUCache
 from ..decorators import handle_errors, retry
-from ..defaults import MAX_FETCH_LENGTH
+from ..defaults import (
+    FETCH_HTTP2,
+    FETCH_KEEPALIVE_EXPIRY,
+    FETCH_MAX_CONNECTIONS,
+    FETCH_MAX_CONNECTIONS_PER_HOST,
+    FETCH_MAX_KEEPALIVE_CONNECTIONS,
+    FETCH_TRUNCATE_OVERSIZED,
+    MAX_FETCH_LENGTH,
+)
 from ..exceptions.fetch_exceptions import (
     ContentNotFound,
     DecodingException,
@@ -25,6 +34,13 @@ from ..exceptions.fetch_exceptions import (
     NetworkTimeoutException,
     ProtocolViolationException,
 )
+from .extractors import get_extractor
+from .page_cache import PageCache
+
+try:
+    import h2  # noqa: F401 , only needed by httpx for http2 support
+except ImportError:
+    h2 = None
 
 URL_PATTERN = re.compile(
     r"^https?:\/\/(?:[a-zA-Z0-9-]+\.)*"  # scheme and sub-domain
@@ -37,7 +53,67 @@ URL_PATTERN = re.compile(
 # ^https?:\/\/(?:[a-zA-Z0-9-]+\.)*[a-zA-Z0-9-_]+\.[a-z]{2,7}(?:\/[a-zA-Z0-9-_:+]+)*\/?(?:\?[a-zA-Z0-9-_]+=[a-zA-Z0-9-_]+(?:&[a-zA-Z0-9-_]+=[a-zA-Z0-9-_]+)*)?$
 
 
+async def read_body(res: httpx.Response, limit: int, truncate: bool = False):
+    """
+    Reads body upto `limit` bytes, whatever the Content-Length says,
+    either keeping the first `limit` bytes or raising if body is larger."""
+
+    body = bytearray()
+    async for chunk in res.aiter_bytes(7 * 1024):
+        remaining = limit - len(body)
+
+        if len(chunk) > remaining:
+            if not truncate:
+                raise LengthException("Content length is more than maximum fetch limit.")
+
+            body += chunk[:remaining]
+            break
+
+        body += chunk
+
+    return bytes(body)
+
+
+def extract_text(content: bytes):
+    return get_extractor().extract(content)
+
+
 class FetchWrapper:
+    _client: httpx.AsyncClient = None
+    _hosts = LRUCache(1024)  # host -> semaphore limiting connections to it
+
+    @classmethod
+    def get_client(cls):
+        "Long lived client, so connections are kept alive and reused between rows."
+
+        if cls._client is None:
+            cls._client = httpx.AsyncClient(
+                headers={
+                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
+                    " AppleWebKit/537.36 (KHTML, like Gecko)"
+                    " Chrome/117.0.5938.62 Safari/537.36",
+                },
+                follow_redirects=True,
+                http2=FETCH_HTTP2 and h2 is not None,
+                limits=httpx.Limits(
+                    max_connections=FETCH_MAX_CONNECTIONS,
+                    max_keepalive_connections=FETCH_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=FETCH_KEEPALIVE_EXPIRY,
+                ),
+            )
+
+        return cls._client
+
+    @classmethod
+    def host_limiter(cls, url: str):
+        host = httpx.URL(url).host
+
+        limiter = cls._hosts.get(host)
+        if limiter is None:
+            limiter = asyncio.Semaphore(FETCH_MAX_CONNECTIONS_PER_HOST)
+            cls._hosts.set(host, limiter)
+
+        return limiter
 
     @staticmethod
     def is_url(s: str):
@@ -69,43 +145,42 @@ class FetchWrapper:
         }
     )
     @retry((TimeoutException, NetworkError))
-    def fetch_url(url: str):
-        with httpx.stream(
-            "GET",
-            url,
-            headers={
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
-                " AppleWebKit/537.36 (KHTML, like Gecko)"
-                " Chrome/117.0.5938.62 Safari/537.36",
-            },
-            follow_redirects=True,
-        ) as res:
+    async def fetch_url(url: str, cache: PageCache = None):
+        key = PageCache.key(url)
+        entry = None if cache is None else await cache.get(key)
 
-            res.raise_for_status()
+        if entry is not None and PageCache.is_fresh(entry):
+            return entry["text"]
 
-            if "html" not in res.headers.get("Content-Type", ""):
-                raise ContentNotFound("HTML content not found in the URL.")
+        headers = {} if entry is None else PageCache.validators(entry)
 
-            length = int(res.headers.get("Content-Length", -1))
+        async with FetchWrapper.host_limiter(url), FetchWrapper.get_client().stream(
+            "GET", url, headers=headers
+        ) as res:
 
-            content = b""
-            if length > MAX_FETCH_LENGTH:
-                raise LengthException("Content length is more than maximum fetch limit.")
+            content = None
+            if res.status_code == 304 and entry is not None:
+                pass  # cached text is still valid
 
-            elif length == -1:
-                body_length = 0
-                for chunk in res.iter_bytes(7 * 1024):
+            else:
+                res.raise_for_status()
 
-                    body_length += len(chunk)
-                    if body_length > MAX_FETCH_LENGTH:
-                        raise LengthException("Content length is more than maximum fetch limit.")
+                if "html" not in res.headers.get("Content-Type", ""):
+                    raise ContentNotFound("HTML content not found in the URL.")
 
-                    content += chunk
-            else:
-                content = res.read()
+                length = int(res.headers.get("Content-Length", -1))
+                if length > MAX_FETCH_LENGTH and not FETCH_TRUNCATE_OVERSIZED:
+                    raise LengthException("Content length is more than maximum fetch limit.")
+
+                content = await read_body(res, MAX_FETCH_LENGTH, FETCH_TRUNCATE_OVERSIZED)
+
+        if content is None:
+            text = entry["text"]
+        else:
+            # parsing is cpu bound, keeping it off the event loop.
+            text = await asyncio.to_thread(extract_text, content)
 
-            soup = BeautifulSoup(content, "lxml")
-            if soup.body is None:
-                raise ContentNotFound("No content found in the URL.")
+        if cache is not None:
+            await cache.set(key, PageCache.make_entry(text, res.headers, entry))
 
-            return soup.body.get_text("\n", True).strip()
+        return text
@@ -1,35 +1,65 @@
 import asyncio
+import shutil
+import tempfile
 from functools import partial
-from io import BytesIO
 from pathlib import Path
+from typing import Awaitable, Callable, Iterator
 
 from fastapi import Response, UploadFile
-
-from ..defaults import COOKIE_DURATION, MIN_DATA_LENGTH, S3_UPLOAD_FOLDER
+from pymongo import MongoClient
+
+from ..decorators import RetryBudget, retry_budget
+from ..defaults import (
+    COOKIE_DURATION,
+    GENERATION_MODE,
+    INTERACTION_CACHE_MONGO,
+    INTERACTION_CACHE_TTL,
+    MAX_FILE_GENERATIONS,
+    MIN_DATA_LENGTH,
+    MONGO_CACHE_COL_NAME,
+    MONGO_PAGE_CACHE_COL_NAME,
+    PAGE_CACHE_MONGO,
+    PAGE_CACHE_TTL,
+    ROW_QUEUE_SIZE,
+    S3_UPLOAD_FOLDER,
+    SOURCE_CHUNKING,
+)
 from ..exceptions import BaseAppException
 from ..exceptions.common import DataTooShort
+from ..exceptions.mongo_exceptions import MongoException
 from ..logging import logger
+from ..mongo.cache import MongoCache
 from ..mongo.db import Database
 from ..mongo.model import GenerationStatus, SyntheticDataDoc
-from ..mongo.utils import ensure_connection
-from ..openai.synthetic_model import SyntheticDataModel
+from ..mongo.status import StatusStore, StatusWriter
+from ..mongo.utils import get_connection, hold_connection
+from ..openai.backends import LLMBackend, make_backend
+from ..openai.cache import InteractionCache
+from ..openai.data_models import interaction_types
+from ..openai.synthetic_model import SyntheticDataModel, turn_listener
+from ..openai.tokens import prepare_source
 from ..s3.bucket import Bucket
-from ..s3.utils import ensure_session
+from ..s3.multipart import MultipartWriter
+from ..s3.utils import get_session
 from ..utils import ensure_string_in_dict
+from .context import RequestContext
 from .csv_file import CSVFile, CSVOutFile
+from .dedup import SourceDedup
 from .encrypted_cookie import EncryptedCookie
 from .fetch_url import FetchWrapper
-from .models import PostData
+from .models import GenerationModes, OpenAIParams, PostData, SourceChunking
+from .page_cache import PageCache
+from .scheduler import Job, scheduler
 
 log = logger(__name__)
 
 
 def set_cookie(res: Response, data: PostData):
-    # check for creds first
-    ensure_connection(data.mongo_url)
-    ensure_session(data.s3_params)
+    # check for creds first, the validated clients are kept for the requests made with cookie
+    get_connection(data.mongo_url)
+    get_session(data.s3_params)
 
-    cookie = EncryptedCookie()
+    cookie = EncryptedCookie.get_default()
     session_data = cookie.encrypt(data.model_dump())
     res.set_cookie("sid", session_data, COOKIE_DURATION, httponly=True)
     return {"ok": True}
@@ -40,23 +70,25 @@ def delete_cookie(res: Response):
     return {"ok": True}
 
 
-def process_data(source: str, model: SyntheticDataModel):
+async def process_data(
+    source: str, model: SyntheticDataModel, pages: PageCache, chunking: SourceChunking
+):
 
     status = GenerationStatus(succeed=False, source=source)
 
     try:
         if FetchWrapper.is_url(source):
-            source = FetchWrapper.fetch_url(source)
+            source = await FetchWrapper.fetch_url(source, pages)
 
         elif FetchWrapper.is_url("http://" + source):  # re validating without http
-            source = FetchWrapper.fetch_url("http://" + source)
+            source = await FetchWrapper.fetch_url("http://" + source, pages)
 
         # here we have either url fetched data or src data
         if len(source) < MIN_DATA_LENGTH:
             raise DataTooShort("Source data is too short to generate interactions.")
 
-        support_data = model.generate_customer_support_interactions(source)
-        sales_data = model.generate_sales_agent_interactions(source)
+        chunks = await asyncio.to_thread(prepare_source, source, chunking, model.model_name)
+        data = await model.generate_chunked_interactions(chunks)
 
     except BaseAppException as e:
         status.reason = str(e)
@@ -67,28 +99,176 @@ def process_data(source: str, model: SyntheticDataModel):
 
     else:
         status.succeed = True
-        status.set_data(support_data, sales_data)
+        status.set_data(data)
 
-    finally:
-        return status
+    return status
+
+
+async def spool_upload(file: UploadFile):
+    "Copies an upload to a temp file of its own, as uploads are closed with their request."
+
+    tmp = tempfile.TemporaryFile()
+    await asyncio.to_thread(shutil.copyfileobj, file.file, tmp)
+    tmp.seek(0)
+    return UploadFile(tmp, filename=file.filename)
+
+
+def output_key(doc: SyntheticDataDoc):
+    return Path(S3_UPLOAD_FOLDER, str(doc.id) + ".csv").as_posix()
+
+
+async def process_rows(sources: Iterator[str], handle: Callable[[int, str], Awaitable]):
+    """
+    Feeds rows read lazily from `sources` to a fixed pool of workers through a bounded queue,
+    so only a handful of rows are held in memory at once whatever the size of file."""
 
+    queue = asyncio.Queue(ROW_QUEUE_SIZE)
 
-def upload_to_s3(bucket, key: str, data: str):
-    file = BytesIO(data.encode("utf-8"))
-    bucket.upload_file(key, file)
-    file.close()
+    async def worker():
+        while (item := await queue.get()) is not None:
+            await handle(*item)
 
+    workers = [asyncio.ensure_future(worker()) for _ in range(MAX_FILE_GENERATIONS)]
+
+    try:
+        for item in enumerate(sources):
+            await queue.put(item)
+
+        for _ in workers:
+            await queue.put(None)
+
+        await asyncio.gather(*workers)
+
+    except BaseException:
+        for task in workers:
+            task.cancel()
+        raise
+
+
+class RowOrder:
+    """
+    Writes finished rows in input order, holding the ones finishing ahead of earlier rows.
+    Rows `limit` or more ahead of the first unfinished one wait, so few rows are ever held."""
+
+    def __init__(
+        self, write: Callable[[list], None], limit: int = MAX_FILE_GENERATIONS + ROW_QUEUE_SIZE
+    ) -> None:
+        self._write = write
+        self.limit = limit
+        self._next = 0
+        self._held: dict[int, list] = {}
+        self._moved = asyncio.Condition()
+
+    async def put(self, row: int, values: list = None):
+        "Values of a finished row, None for a row not written at all."
+
+        async with self._moved:
+            await self._moved.wait_for(lambda: row - self._next < self.limit)
+            self._held[row] = values
+
+            if row != self._next:
+                return
+
+            while self._next in self._held:
+                values = self._held.pop(self._next)
+                if values is not None:
+                    self._write(values)
+                self._next += 1
+
+            self._moved.notify_all()
+
+
+async def process_file(
+    file: UploadFile,
+    column,
+    model: SyntheticDataModel,
+    pages: PageCache,
+    chunking: SourceChunking,
+    job: Job,
+    dedup: SourceDedup,
+    db: Database,
+    statuses: StatusStore,
+    bucket: Callable[[], Bucket],
+    res: list,
+    errs: list,
+    emit: Callable[[dict], Awaitable] = None,
+    turns: bool = False,
+):
+    """
+    `emit` gets an event for each row as soon as it's done and one for file once it's done,
+    along with each turn of the conversations with `turns`."""
 
-async def process_file(file: UploadFile, column, model: SyntheticDataModel, res: list, errs: list):
     succeed = False
     reason = None
 
-    try:
-        csv = CSVFile(file, column)
+    # inserted right away with statuses written as rows finish, so progress can be followed.
+    doc = SyntheticDataDoc(file_name=file.filename, succeed=False)
+    await asyncio.to_thread(db.insert, doc)
+    writer = StatusWriter(statuses)
+
+    cols = list(interaction_types)
+    csv_out = CSVOutFile(cols)
+    order = RowOrder(csv_out.write)
+    output = None
+
+    generation_errs = []
+
+    async def emit_turn(row: int, name: str, question: str, answer: str):
+        await emit(
+            {
+                "event": "turn",
+                "file_name": doc.file_name,
+                "row": row,
+                "type": name,
+                "question": question,
+                "answer": answer,
+            }
+        )
 
-        statuses = await asyncio.gather(
-            *[asyncio.to_thread(partial(process_data, source, model)) for source in csv.iterate()]
+    async def handle(row: int, source: str):
+        if emit is not None and turns:
+            turn_listener.set(partial(emit_turn, row))
+
+        status = await dedup.run(
+            source, lambda: job.run(process_data(source, model, pages, chunking))
         )
+        status.row = row
+        status.doc_id = doc.id
+        await writer.add(status)
+
+        if emit is not None:
+            await emit(
+                {
+                    "event": "status",
+                    "file_name": doc.file_name,
+                    "row": row,
+                    "id": str(status.id),
+                    "succeed": status.succeed,
+                    "reason": status.reason,
+                    "source": status.source,
+                    "generated_data": status.generated_data.model_dump(),
+                }
+            )
+
+        doc.processed += 1
+        if status.succeed:
+            data = status.generated_data
+            await order.put(row, [getattr(data, col) for col in cols])
+        else:
+            doc.failed += 1
+            generation_errs.append(
+                ensure_string_in_dict(status.model_dump(include=["id", "reason"]))
+            )
+            await order.put(row)  # lets the rows held behind it through
+
+        await output.write(csv_out.drain())
+
+    try:
+        output = MultipartWriter(await asyncio.to_thread(bucket), output_key(doc))
+
+        csv = CSVFile(file, column)
+        await process_rows(csv.iterate(), handle)
+        doc.col_name = csv.col
 
     except BaseAppException as e:
         reason = str(e)
@@ -102,64 +282,131 @@ async def process_file(file: UploadFile, column, model: SyntheticDataModel, res:
 
     finally:
 
-        db = Database()
+        try:
+            await writer.flush()
+        except BaseAppException as e:
+            if succeed:
+                succeed = False
+                reason = str(e)
 
-        doc = SyntheticDataDoc(
-            file_name=file.filename,
-            succeed=succeed,
-            reason=reason,
-        )
+        doc.succeed = succeed
+        doc.reason = reason
 
-        csv_out = CSVOutFile(["customer_support", "sales_agent"])
-        generation_errs = []
+        if doc.succeed and doc.failed == doc.processed:
+            doc.succeed = False
+            doc.reason = "All generation statuses failed."
 
-        if doc.succeed:
-            doc.col_name = csv.col
-            all_failed = True
-            for status in statuses:
-                if not status.succeed:
-                    generation_errs.append(
-                        ensure_string_in_dict(status.model_dump(include=["id", "reason"]))
-                    )
+        if output is not None:
+            try:
+                if doc.succeed:
+                    await output.complete()
                 else:
-                    all_failed = False
-                    data = status.generated_data
-                    csv_out.write([data.customer_support, data.sales_agent])
+                    await output.abort()
 
-                doc.add_status(status)
-
-            if all_failed:
-                doc.succeed = False
-                doc.reason = "All generation statuses failed."
+            except BaseAppException as e:
+                if not doc.succeed:  # nothing useful is lost if the partial upload lingers
+                    log.warning("Failed to abort upload of '%s'.", output.key)
+                else:
+                    succeed = doc.succeed = False
+                    doc.reason = str(e)
 
-        else:
+        if not succeed:
             errs.append(doc.model_dump(include=["file_name", "reason"]))
 
         if len(generation_errs) > 0:
             errs.append({"file_name": doc.file_name, "errs": generation_errs})
 
-        db.insert(doc)
+        await asyncio.to_thread(db.finish, doc)
 
         if doc.succeed:
             res.append(ensure_string_in_dict(doc.model_dump(include=["id", "file_name"])))
-            bucket = Bucket()
-            await asyncio.to_thread(
-                partial(
-                    upload_to_s3,
-                    bucket,
-                    Path(S3_UPLOAD_FOLDER, str(doc.id) + ".csv").as_posix(),
-                    csv_out.finish().getvalue(),
-                )
+
+        if emit is not None:
+            await emit(
+                {"event": "file", "id": str(doc.id)}
+                | doc.model_dump(include=["file_name", "succeed", "reason", "processed", "failed"])
             )
 
 
-async def process_files(files: list[UploadFile], column: str = None):
+async def mongo_cache(client: MongoClient, col_name: str, ttl: int):
+    try:
+        return await asyncio.to_thread(MongoCache, client, col_name, ttl)
+    except MongoException:
+        log.warning("Mongo cache '%s' is unavailable, using only in-memory cache.", col_name)
+        return None
+
+
+async def prepare_generation(
+    ctx: RequestContext,
+    mode: GenerationModes,
+    params: OpenAIParams,
+    chat_model: LLMBackend = None,
+):
+    """
+    Model generating the interactions and cache of fetched pages, each with its mongo tier.
+    Interactions are generated by `chat_model`, or by the backend picked by env if not given."""
+
+    store = None
+    if INTERACTION_CACHE_MONGO:
+        store = await mongo_cache(ctx.client, MONGO_CACHE_COL_NAME, INTERACTION_CACHE_TTL)
+
+    if chat_model is None:
+        chat_model = make_backend(params)
+
+    model = SyntheticDataModel(chat_model, mode, InteractionCache(store))
+
+    store = None
+    if PAGE_CACHE_MONGO:
+        store = await mongo_cache(ctx.client, MONGO_PAGE_CACHE_COL_NAME, PAGE_CACHE_TTL)
+
+    return model, PageCache(store)
+
+
+async def process_files(
+    files: list[UploadFile],
+    ctx: RequestContext,
+    column: str = None,
+    mode: GenerationModes = GENERATION_MODE,
+    chunking: SourceChunking = SOURCE_CHUNKING,
+    emit: Callable[[dict], Awaitable] = None,
+    turns: bool = False,
+):
     if column is not None:
         column = column.strip()
         if len(column) == 0:
             column = None
 
-    model = SyntheticDataModel()
-    res, errs = [], []
-    await asyncio.gather(*[process_file(file, column, model, res, errs) for file in files])
+    retry_budget.set(RetryBudget())
+
+    # kept open till the files are done, even if the client is evicted from cache meanwhile.
+    with hold_connection(ctx.client):
+        model, pages = await prepare_generation(ctx, mode, ctx.params)
+        db = Database(ctx.client)
+        statuses = await asyncio.to_thread(StatusStore, ctx.client)
+        dedup = SourceDedup()  # shared by files, as exports often repeat rows across them
+        res, errs = [], []
+
+        async with scheduler.job(ctx.session_key) as job:
+            await asyncio.gather(
+                *[
+                    process_file(
+                        file,
+                        column,
+                        model,
+                        pages,
+                        chunking,
+                        job,
+                        dedup,
+                        db,
+                        statuses,
+                        ctx.bucket,
+                        res,
+                        errs,
+                        emit,
+                        turns,
+                    )
+                    for file in files
+                ]
+            )
+
     return {"files": res, "errors": errs}
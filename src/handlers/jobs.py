@@ -0,0 +1,440 @@
+import asyncio
+import itertools
+from typing import Callable, Coroutine
+
+from bson import ObjectId
+from fastapi import HTTPException, UploadFile, status
+from pymongo import MongoClient
+
+from ..decorators import RetryBudget, retry_budget
+from ..defaults import (
+    BATCH_MAX_ROWS,
+    GENERATION_MODE,
+    JOB_EXECUTION,
+    JOB_ROWS_PAGE_SIZE,
+    MAX_BACKGROUND_JOBS,
+    MAX_FILE_GENERATIONS,
+    SOURCE_CHUNKING,
+    STATUS_BATCH_SIZE,
+    WORK_LEASE_DURATION,
+    WORK_MAX_ATTEMPTS,
+    WORK_POLL_INTERVAL,
+    WORK_PUT_BATCH,
+    WORK_QUEUE,
+)
+from ..exceptions import BaseAppException
+from ..exceptions.job_exceptions import JobNotResumable
+from ..logging import logger
+from ..mongo.db import Database
+from ..mongo.jobs import JobStore
+from ..mongo.model import GenerationStatus, JobDoc, SyntheticDataDoc
+from ..mongo.status import StatusStore, StatusWriter
+from ..mongo.utils import hold_connection, make_id
+from ..mongo.work_queue import MongoWorkQueue
+from ..openai.batch_model import BatchChatModel
+from ..openai.data_models import interaction_types
+from ..openai.synthetic_model import SyntheticDataModel
+from ..s3.bucket import Bucket
+from ..s3.multipart import MultipartWriter
+from ..utils import ensure_string_in_dict
+from ..work_queue import make_task, memory_queue
+from .context import RequestContext
+from .csv_file import CSVFile, CSVOutFile
+from .dedup import SourceDedup
+from .funcs import output_key, prepare_generation, process_data, spool_upload
+from .models import ExecutionModes, GenerationModes, OpenAIParams, SourceChunking
+from .page_cache import PageCache
+from .scheduler import Job, batch_scheduler, scheduler
+
+log = logger(__name__)
+
+
+class JobRunner:
+    "Runs submitted jobs in the background on a fixed pool of workers, in order of submission."
+
+    def __init__(self, workers: int = MAX_BACKGROUND_JOBS) -> None:
+        self.workers = workers
+        self._queue: asyncio.Queue = None
+        self._tasks: list[asyncio.Task] = []
+
+    def _start(self):
+        # started lazily, so the queue and workers belong to the loop serving the requests.
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._tasks = [asyncio.ensure_future(self._work()) for _ in range(self.workers)]
+
+    async def _work(self):
+        while True:
+            coro = await self._queue.get()
+
+            try:
+                await coro
+            except Exception:
+                log.exception("Exception while running background job.")
+
+    def submit(self, coro: Coroutine):
+        self._start()
+        self._queue.put_nowait(coro)
+
+
+job_runner = JobRunner()
+
+
+def get_work_queue(client: MongoClient):
+    if WORK_QUEUE == "memory":
+        return memory_queue
+
+    return MongoWorkQueue(client)
+
+
+async def enqueue_file(file: UploadFile, column, job_id: ObjectId, db: Database, queue):
+    doc = SyntheticDataDoc(job_id=job_id, file_name=file.filename, succeed=False)
+    await asyncio.to_thread(db.insert, doc)
+
+    try:
+        csv = CSVFile(file, column)
+
+        tasks = []
+        for row, source in enumerate(csv.iterate()):
+            tasks.append(make_task(job_id, doc.id, row, source))
+
+            if len(tasks) >= WORK_PUT_BATCH:
+                await asyncio.to_thread(queue.put, tasks)
+                tasks = []
+
+        if len(tasks) > 0:
+            await asyncio.to_thread(queue.put, tasks)
+
+        await asyncio.to_thread(db.update, doc.id, {"col_name": csv.col})
+
+    except Exception as e:
+        if isinstance(e, BaseAppException):
+            doc.reason = str(e)
+        else:
+            log.exception("Exception while queuing file.")
+            doc.reason = "Some Internal error occurred."
+
+        await asyncio.to_thread(queue.discard, doc.id)  # rows queued before the failure
+        await asyncio.to_thread(db.finish, doc)
+
+
+async def keep_leased(queue, task_id: ObjectId):
+    "Renews lease of a row while it's processed, so only rows of a dead worker expire."
+
+    while True:
+        await asyncio.sleep(WORK_LEASE_DURATION / 3)
+
+        try:
+            await asyncio.to_thread(queue.renew, task_id, WORK_LEASE_DURATION)
+        except BaseAppException as e:
+            log.warning("Couldn't renew lease of row '%s': %s", task_id, e)
+
+
+async def work(
+    job: JobDoc,
+    queue,
+    writer: StatusWriter,
+    limiter: Job,
+    dedup: SourceDedup,
+    model: SyntheticDataModel,
+    pages: PageCache,
+):
+    """
+    Leases rows of job one at a time until none are left, in this or any other process.
+    Rows are acked once their statuses are written by `writer`."""
+
+    while True:
+        async with limiter.slot():
+            task = await asyncio.to_thread(queue.lease, job.id, WORK_LEASE_DURATION)
+
+            if task is not None:
+                renewal = asyncio.ensure_future(keep_leased(queue, task["_id"]))
+
+                try:
+                    if task["attempts"] > WORK_MAX_ATTEMPTS:
+                        reason = f"Row couldn't be processed in {WORK_MAX_ATTEMPTS} attempts."
+                        status = GenerationStatus(
+                            succeed=False, source=task["source"], reason=reason
+                        )
+                    else:
+                        status = await dedup.run(
+                            task["source"],
+                            lambda: process_data(task["source"], model, pages, job.chunking),
+                        )
+
+                    status.row = task["row"]
+                    status.doc_id = task["doc_id"]
+                    await writer.add(status, task["_id"])
+
+                except Exception:
+                    await asyncio.to_thread(queue.release, task["_id"])
+                    raise
+
+                finally:
+                    renewal.cancel()
+
+                continue
+
+        await writer.flush()  # so rows of this worker don't count as remaining
+
+        # rest of the rows are leased by other workers, which may never ack them if they die.
+        if await asyncio.to_thread(queue.remaining, job.id) == 0:
+            return
+
+        await asyncio.sleep(WORK_POLL_INTERVAL)
+
+
+async def write_output(doc: SyntheticDataDoc, statuses: StatusStore, bucket: Bucket):
+    cols = list(interaction_types)
+    csv_out = CSVOutFile(cols)
+    output = MultipartWriter(bucket, output_key(doc))
+
+    cursor = statuses.iterate(doc.id, succeed=True)
+
+    try:
+        # read in batches off the loop, as the cursor blocks while fetching more.
+        while batch := await asyncio.to_thread(list, itertools.islice(cursor, STATUS_BATCH_SIZE)):
+            for data in batch:
+                generated = data["generated_data"]
+                csv_out.write([generated.get(col) for col in cols])
+
+            await output.write(csv_out.drain())
+
+        await output.complete()
+
+    except BaseException:
+        await output.abort()
+        raise
+
+
+async def finish_job(
+    job: JobDoc,
+    store: JobStore,
+    db: Database,
+    statuses: StatusStore,
+    bucket: Callable[[], Bucket],
+):
+    "Writes output of every file once all rows are done, only by the worker claiming it first."
+
+    if not await asyncio.to_thread(store.transition, job.id, "running", "writing"):
+        return
+
+    res, errs = [], []
+
+    for doc in await asyncio.to_thread(db.fetch_job, job.id):
+        if not doc.finished:
+            doc.processed, doc.failed = await asyncio.to_thread(statuses.count, doc.id)
+
+            if doc.failed == doc.processed:
+                doc.reason = "All generation statuses failed."
+
+            else:
+                try:
+                    await write_output(doc, statuses, await asyncio.to_thread(bucket))
+                    doc.succeed = True
+                except BaseAppException as e:
+                    doc.reason = str(e)
+                    errs.append(doc.model_dump(include=["file_name", "reason"]))
+
+            await asyncio.to_thread(db.finish, doc)
+
+        elif doc.processed == 0:  # failed before its rows were queued
+            errs.append(doc.model_dump(include=["file_name", "reason"]))
+
+        # only counted, failed rows themselves are paged through from `get_job`.
+        if doc.failed > 0:
+            errs.append({"file_name": doc.file_name, "failed": doc.failed})
+
+        if doc.succeed:
+            res.append(ensure_string_in_dict(doc.model_dump(include=["id", "file_name"])))
+
+    await asyncio.to_thread(store.set_state, job.id, "done", result={"files": res, "errors": errs})
+
+
+async def run_job(
+    job: JobDoc,
+    store: JobStore,
+    files: list[UploadFile],
+    ctx: RequestContext,
+    column: str = None,
+):
+    """
+    Queues the rows of files, if not queued already, and works through them along with
+    any other process working on the same job. Job is resumed by running it without files."""
+
+    # held for the whole job, which outlives the request and any client cache expiry.
+    with hold_connection(ctx.client):
+        reason = None
+
+        try:
+            queue = await asyncio.to_thread(get_work_queue, ctx.client)
+            db = Database(ctx.client)
+
+            if files is not None:
+                try:
+                    await asyncio.to_thread(store.set_state, job.id, "running")
+                    await asyncio.gather(
+                        *[enqueue_file(file, column, job.id, db, queue) for file in files]
+                    )
+                    await asyncio.to_thread(store.set_state, job.id, "running", enqueued=True)
+
+                finally:
+                    for file in files:
+                        file.file.close()
+
+            retry_budget.set(RetryBudget())
+            params = OpenAIParams(**job.params)
+
+            chat_model = None
+            if job.execution == "batch":
+                chat_model = BatchChatModel(
+                    params, lambda batch_id: asyncio.to_thread(store.add_batch, job.id, batch_id)
+                )
+                # rounds submitted before a resume are waited on instead of being sent again.
+                await chat_model.adopt(job.batches)
+
+            model, pages = await prepare_generation(ctx, job.mode, params, chat_model)
+
+            statuses = await asyncio.to_thread(StatusStore, ctx.client)
+            writer = StatusWriter(statuses, lambda ids: asyncio.to_thread(queue.ack, ids))
+
+            dedup = SourceDedup()
+
+            workers = MAX_FILE_GENERATIONS * len(job.file_names)
+            jobs = scheduler
+
+            if job.execution == "batch":
+                # enough workers for all rows to go in the same rounds, up to the process limit.
+                remaining = await asyncio.to_thread(queue.remaining, job.id)
+                workers = max(1, min(remaining, BATCH_MAX_ROWS))
+                jobs = batch_scheduler
+
+            async with jobs.job(ctx.session_key) as limiter:
+                tasks = [
+                    asyncio.ensure_future(work(job, queue, writer, limiter, dedup, model, pages))
+                    for _ in range(workers)
+                ]
+
+                try:
+                    await asyncio.gather(*tasks)
+
+                except BaseException:
+                    # waited on, so none outlives the slot and client hold of job.
+                    for task in tasks:
+                        task.cancel()
+                    await asyncio.gather(*tasks, return_exceptions=True)
+                    raise
+
+            await finish_job(job, store, db, statuses, ctx.bucket)
+
+        except BaseAppException as e:
+            reason = str(e)
+
+        except Exception:
+            log.exception("Exception while running job.")
+            reason = "Some Internal error occurred."
+
+        if reason is not None:
+            await asyncio.to_thread(store.set_state, job.id, "failed", reason=reason)
+
+
+async def submit_job(
+    files: list[UploadFile],
+    ctx: RequestContext,
+    column: str = None,
+    mode: GenerationModes = GENERATION_MODE,
+    chunking: SourceChunking = SOURCE_CHUNKING,
+    execution: ExecutionModes = JOB_EXECUTION,
+):
+    "Queues the files to be processed in background and returns the job id right away."
+
+    store = JobStore(ctx.client)
+    job = JobDoc(
+        owner_key=ctx.owner_key,
+        file_names=[file.filename or "" for file in files],
+        mode=mode,
+        chunking=chunking,
+        execution=execution,
+        params=ctx.params.model_dump(),
+    )
+    await asyncio.to_thread(store.insert, job)
+
+    files = [await spool_upload(file) for file in files]
+    job_runner.submit(run_job(job, store, files, ctx, column))
+
+    return {"id": str(job.id), "state": job.state}
+
+
+def find_job(store: JobStore, job_id: str, owner_key: str):
+    job = store.get(make_id(job_id), owner_key)
+    if job is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Job not found.")
+
+    return job
+
+
+async def resume_job(job_id: str, ctx: RequestContext):
+    """
+    Picks up a job left unfinished by a process that died, leasing its remaining rows.
+    Running it in more processes at once spreads the rows between them."""
+
+    store = JobStore(ctx.client)
+    job = await asyncio.to_thread(find_job, store, job_id, ctx.owner_key)
+
+    if job.state == "done":
+        raise JobNotResumable("Job is already done.")
+
+    if not job.enqueued:
+        raise JobNotResumable(
+            "Job was interrupted before its rows were queued, submit its files again."
+        )
+
+    await asyncio.to_thread(store.set_state, job.id, "running", reason=None)
+    job_runner.submit(run_job(job, store, None, ctx))
+
+    return {"id": str(job.id), "state": "running"}
+
+
+def get_job(
+    job_id: str,
+    ctx: RequestContext,
+    failed: bool = False,
+    offset: int = 0,
+    limit: int = JOB_ROWS_PAGE_SIZE,
+):
+    "Job with a page of rows of each of its files, only the failed ones with `failed`."
+
+    job = find_job(JobStore(ctx.client), job_id, ctx.owner_key)
+    statuses = StatusStore(ctx.client)
+    succeed = False if failed else None
+
+    files = []
+    for doc in Database(ctx.client).fetch_job(job.id):
+        projection = {"_id": True, "row": True, "succeed": True, "reason": True}
+        rows = [
+            {
+                "row": data["row"],
+                "id": str(data["_id"]),
+                "succeed": data["succeed"],
+                "reason": data["reason"],
+            }
+            for data in statuses.iterate(doc.id, succeed, projection, offset, limit)
+        ]
+
+        files.append(
+            ensure_string_in_dict(doc.model_dump(include=["id", "file_name"]))
+            | doc.model_dump(
+                include=["col_name", "finished", "succeed", "reason", "processed", "failed"]
+            )
+            | {"rows": rows}
+        )
+
+    return {
+        "id": str(job.id),
+        "state": job.state,
+        "execution": job.execution,
+        "reason": job.reason,
+        "file_names": job.file_names,
+        "files": files,
+        "result": job.result,
+    }
@@ -36,6 +36,12 @@ class CookieData(BaseData):
     "Cookie data, passed along everywhere, even to browser but in encrypted form."
 
 
+GenerationModes = Literal["turns", "batched"]
+SourceChunking = Literal["truncate", "chunk"]
+# "batch" sends the calls of a job through OpenAI Batch API, slower but half the price.
+ExecutionModes = Literal["realtime", "batch"]
+
+
 # Models capable of structured outputs,
 Models = Literal["gpt-4o", "gpt-4o-2024-08-06", "gpt-4o-mini", "gpt-4o-mini-2024-07-18"]
 
@@ -0,0 +1,65 @@
+import hashlib
+import time
+
+import httpx
+
+from ..cache import LRUCache, TieredCache
+from ..defaults import PAGE_CACHE_FRESH_TTL, PAGE_CACHE_SIZE, PAGE_CACHE_TTL
+from ..mongo.cache import MongoCache
+
+_memory = LRUCache(PAGE_CACHE_SIZE, PAGE_CACHE_TTL)
+
+
+def normalize_url(url: str):
+    "Canonical form of url, so trivially different spellings share the same cache entry."
+
+    url = httpx.URL(url)
+    params = sorted(url.params.multi_items())
+
+    port = url.port
+    if (url.scheme, port) in (("http", 80), ("https", 443)):
+        port = None
+
+    url = url.copy_with(
+        fragment=None, port=port, path=url.path or "/", params=httpx.QueryParams(params)
+    )
+    return str(url)
+
+
+class PageCache(TieredCache):
+    """
+    Extracted text of fetched pages keyed by normalized url, along with
+    the validators needed to revalidate it once it isn't fresh anymore."""
+
+    def __init__(self, store: MongoCache = None) -> None:
+        super().__init__(_memory, store)
+
+    @staticmethod
+    def key(url: str):
+        return hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def is_fresh(entry: dict):
+        return time.time() - entry["fetched_at"] < PAGE_CACHE_FRESH_TTL
+
+    @staticmethod
+    def validators(entry: dict):
+        headers = {}
+
+        if entry.get("etag") is not None:
+            headers["If-None-Match"] = entry["etag"]
+
+        if entry.get("last_modified") is not None:
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        return headers
+
+    @staticmethod
+    def make_entry(text: str, headers: httpx.Headers, previous: dict = None):
+        previous = previous or {}
+        return {
+            "text": text,
+            "etag": headers.get("ETag", previous.get("etag")),
+            "last_modified": headers.get("Last-Modified", previous.get("last_modified")),
+            "fetched_at": time.time(),
+        }
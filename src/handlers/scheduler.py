@@ -0,0 +1,100 @@
+import asyncio
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+from ..defaults import BATCH_MAX_ROWS, MAX_CONCURRENT_GENERATIONS, MAX_SESSION_GENERATIONS
+
+
+class FairSemaphore:
+    "Semaphore that hands freed slots to waiting keys in round-robin order."
+
+    def __init__(self, value: int) -> None:
+        self._value = value
+        self._waiters: OrderedDict[object, deque[asyncio.Future]] = OrderedDict()
+
+    async def acquire(self, key):
+        if self._value > 0 and not self._waiters:
+            self._value -= 1
+            return
+
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(key, deque()).append(fut)
+
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release()  # slot was granted right before cancellation, pass it on
+            raise
+
+    def release(self):
+        while self._waiters:
+            key, waiters = next(iter(self._waiters.items()))
+            fut = waiters.popleft()
+
+            # served key goes to the back so every waiting key gets its turn
+            if len(waiters) > 0:
+                self._waiters.move_to_end(key)
+            else:
+                del self._waiters[key]
+
+            if not fut.done():
+                fut.set_result(None)
+                return
+
+        self._value += 1
+
+
+class Job:
+    "Scheduling handle for a single request, shared by all of its files."
+
+    def __init__(self, scheduler: "Scheduler", session: asyncio.Semaphore) -> None:
+        self._scheduler = scheduler
+        self._session = session
+
+    @asynccontextmanager
+    async def slot(self):
+        async with self._session:
+            await self._scheduler._global.acquire(self)
+            try:
+                yield
+            finally:
+                self._scheduler._global.release()
+
+    async def run(self, coro):
+        async with self.slot():
+            return await coro
+
+
+class Scheduler:
+    """
+    Limits generations in flight process-wide and per cookie session, while sharing
+    the process-wide slots fairly between requests. Files are limited by their worker pools."""
+
+    def __init__(
+        self,
+        limit: int = MAX_CONCURRENT_GENERATIONS,
+        session_limit: int = MAX_SESSION_GENERATIONS,
+    ) -> None:
+        self._global = FairSemaphore(limit)
+        self._session_limit = session_limit
+        self._sessions: dict[str, list] = {}  # session key -> [semaphore, active jobs]
+
+    @asynccontextmanager
+    async def job(self, session_key: str):
+        entry = self._sessions.get(session_key)
+        if entry is None:
+            entry = self._sessions[session_key] = [asyncio.Semaphore(self._session_limit), 0]
+
+        entry[1] += 1
+        try:
+            yield Job(self, entry[0])
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._sessions[session_key]
+
+
+scheduler = Scheduler()
+# rows of batch jobs wait on batches instead of the rate limits, many more are kept in flight.
+batch_scheduler = Scheduler(BATCH_MAX_ROWS, BATCH_MAX_ROWS)
@@ -0,0 +1,79 @@
+import asyncio
+import json
+
+from fastapi import UploadFile
+
+from ..defaults import GENERATION_MODE, SOURCE_CHUNKING, STREAM_QUEUE_SIZE
+from ..exceptions import BaseAppException
+from ..logging import logger
+from .context import RequestContext
+from .funcs import process_files, spool_upload
+from .models import GenerationModes, SourceChunking
+
+log = logger(__name__)
+
+
+async def stream_events(
+    files: list[UploadFile],
+    ctx: RequestContext,
+    column: str,
+    mode: GenerationModes,
+    chunking: SourceChunking,
+    turns: bool,
+):
+    """
+    Processes files in background, yielding its events as NDJSON lines as they happen.
+    Last line is either the result of `/process` or the error it failed with."""
+
+    events = asyncio.Queue(STREAM_QUEUE_SIZE)
+    closed = asyncio.Event()  # set once client went away, events are dropped from then on
+
+    async def emit(event: dict):
+        if not closed.is_set():
+            await events.put(event)
+
+    async def run():
+        try:
+            res = await process_files(files, ctx, column, mode, chunking, emit, turns)
+            event = {"event": "done"} | res
+
+        except BaseAppException as e:
+            event = {"event": "error", "message": str(e)}
+
+        except Exception:
+            log.exception("Exception while streaming files.")
+            event = {"event": "error", "message": "Some Internal error occurred."}
+
+        finally:
+            for file in files:
+                file.file.close()
+
+        await emit(event)
+        await emit(None)
+
+    task = asyncio.ensure_future(run())
+
+    try:
+        while (event := await events.get()) is not None:
+            yield json.dumps(event) + "\n"
+
+    finally:
+        # client went away, no one is left to read the rest. Set first, so cleanup of the
+        # cancelled task doesn't block on a full queue.
+        closed.set()
+        task.cancel()
+
+
+async def stream_files(
+    files: list[UploadFile],
+    ctx: RequestContext,
+    column: str = None,
+    mode: GenerationModes = GENERATION_MODE,
+    chunking: SourceChunking = SOURCE_CHUNKING,
+    turns: bool = False,
+):
+    "Same as `process_files`, but streams status of each row as soon as it's done."
+
+    # spooled as uploads are closed once the response is returned, before it's streamed.
+    files = [await spool_upload(file) for file in files]
+    return stream_events(files, ctx, column, mode, chunking, turns)
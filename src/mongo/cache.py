@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta, timezone
+
+from pymongo import MongoClient
+from pymongo.errors import ConnectionFailure, OperationFailure
+
+from ..decorators import handle_errors, retry
+from ..logging import logger
+from .db import Database
+from .errors import errors_map
+
+log = logger(__name__)
+
+
+class MongoCache(Database):
+    "Key value cache stored in a collection, with entries expired by a TTL index."
+
+    _indexed: set[tuple[int, str]] = set()  # collections already having the TTL index
+
+    def __init__(self, client: MongoClient, col_name: str, ttl: int, db_name: str = None) -> None:
+        super().__init__(client, db_name, col_name)
+        self.ttl = ttl
+        self._ensure_index()
+
+    @handle_errors(errors_map)
+    @retry((ConnectionFailure,))
+    def _ensure_index(self):
+        key = (id(self._conn), self._col.full_name)
+        if key in self._indexed:
+            return
+
+        try:
+            self._col.create_index("created_at", expireAfterSeconds=self.ttl)
+        except OperationFailure:
+            # index exists with another ttl, reads still check the expiry themselves.
+            log.warning("TTL index already exists on '%s' with other options.", self._col.name)
+
+        self._indexed.add(key)
+
+    @handle_errors(errors_map)
+    @retry((ConnectionFailure,))
+    def get(self, key: str):
+        doc = self._col.find_one({"_id": key})
+        if doc is None:
+            return None
+
+        # ttl monitor of mongo runs once a minute, so expired docs may still be around.
+        created_at = doc["created_at"].replace(tzinfo=timezone.utc)
+        if datetime.now(timezone.utc) - created_at >= timedelta(seconds=self.ttl):
+            return None
+
+        return doc["value"]
+
+    @handle_errors(errors_map)
+    @retry((ConnectionFailure,))
+    def set(self, key: str, value):
+        doc = {"_id": key, "value": value, "created_at": datetime.now(timezone.utc)}
+        self._col.replace_one({"_id": key}, doc, upsert=True)
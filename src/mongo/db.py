@@ -1,3 +1,4 @@
+from bson import ObjectId
 from pydantic_core import PydanticSerializationError, ValidationError
 from pymongo import MongoClient
 from pymongo.errors import ConnectionFailure
@@ -11,9 +12,7 @@ from .model import SyntheticDataDoc
 
 
 class Database:
-    _conn: MongoClient = None
-
-    def __init__(self, db_name: str = None, col_name: str = None) -> None:
+    def __init__(self, client: MongoClient, db_name: str = None, col_name: str = None) -> None:
         if db_name is None:
             db_name = MONGO_DB_NAME
 
@@ -23,9 +22,10 @@ class Database:
         self.db_name = db_name
         self.col_name = col_name
 
-        if self._conn is None:
+        if client is None:
             raise DBNotInitialized("DB Connection not ready.")
 
+        self._conn = client
         self._col = self._conn[db_name][col_name]
 
     @handle_errors(
@@ -40,6 +40,17 @@ class Database:
     def insert(self, doc: SyntheticDataDoc):
         self._col.insert_one(doc.model_dump(by_alias=True))
 
+    @handle_errors(errors_map)
+    @retry((ConnectionFailure,))
+    def update(self, doc_id: ObjectId, fields: dict):
+        self._col.update_one({"_id": doc_id}, {"$set": fields})
+
+    @handle_errors(errors_map)
+    @retry((ConnectionFailure,))
+    def finish(self, doc: SyntheticDataDoc):
+        fields = doc.model_dump(include=["succeed", "reason", "col_name", "processed", "failed"])
+        self._col.update_one({"_id": doc.id}, {"$set": fields | {"finished": True}})
+
     @handle_errors(
         errors_map
         | {
@@ -54,6 +65,15 @@ class Database:
         cursor = self._col.find(ids_filter)
         return list(map(SyntheticDataDoc.model_validate, cursor))
 
-    @classmethod
-    def set_connection(cls, client: MongoClient):
-        cls._conn = client
+    @handle_errors(
+        errors_map
+        | {
+            ValidationError: lambda e: ValidationException(
+                f"Validation failed with data model: {e.title}"
+            )
+        }
+    )
+    @retry((ConnectionFailure,))
+    def fetch_job(self, job_id: ObjectId):
+        cursor = self._col.find({"job_id": job_id})
+        return list(map(SyntheticDataDoc.model_validate, cursor))
@@ -0,0 +1,52 @@
+from bson import ObjectId
+from pydantic_core import ValidationError
+from pymongo import MongoClient
+from pymongo.errors import ConnectionFailure
+
+from ..decorators import handle_errors, retry
+from ..defaults import MONGO_JOB_COL_NAME
+from ..exceptions.pydantic_exceptions import ValidationException
+from .db import Database
+from .errors import errors_map
+from .model import JobDoc, JobStates
+
+
+class JobStore(Database):
+    "Background jobs of /jobs route, scoped to the credentials that submitted them."
+
+    def __init__(self, client: MongoClient, db_name: str = None) -> None:
+        super().__init__(client, db_name, MONGO_JOB_COL_NAME)
+
+    @handle_errors(errors_map)
+    @retry((ConnectionFailure,))
+    def set_state(self, job_id: ObjectId, state: JobStates, **fields):
+        self._col.update_one({"_id": job_id}, {"$set": fields | {"state": state}})
+
+    @handle_errors(errors_map)
+    @retry((ConnectionFailure,))
+    def transition(self, job_id: ObjectId, source: JobStates, target: JobStates):
+        "Moves the job to `target` state only if it's still in `source`, tells if it did."
+
+        res = self._col.update_one({"_id": job_id, "state": source}, {"$set": {"state": target}})
+        return res.modified_count == 1
+
+    @handle_errors(errors_map)
+    @retry((ConnectionFailure,))
+    def add_batch(self, job_id: ObjectId, batch_id: str):
+        self._col.update_one({"_id": job_id}, {"$addToSet": {"batches": batch_id}})
+
+    @handle_errors(
+        errors_map
+        | {
+            ValidationError: lambda e: ValidationException(
+                f"Validation failed with data model: {e.title}"
+            )
+        }
+    )
+    @retry((ConnectionFailure,))
+    def get(self, job_id: ObjectId, owner_key: str):
+        doc = self._col.find_one({"_id": job_id, "owner_key": owner_key})
+        if doc is None:
+            return None
+
+        return JobDoc.model_validate(doc)
@@ -1,41 +1,70 @@
-from typing import Optional
+from datetime import datetime, timezone
+from typing import Literal, Optional
 
 from bson import ObjectId
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 from .utils import make_id
 
 
 class GeneratedData(BaseModel):
+    # extra interaction types registered beside these two are kept as extra fields.
+    model_config = ConfigDict(extra="allow")
+
     customer_support: Optional[str] = None
     sales_agent: Optional[str] = None
 
 
 class GenerationStatus(BaseModel):
     id: ObjectId = Field(alias="_id", default_factory=make_id)
+    doc_id: Optional[ObjectId] = None
     succeed: bool
     reason: Optional[str] = None
+    row: Optional[int] = None
     source: str
     generated_data: GeneratedData = GeneratedData()
 
     class Config:
         arbitrary_types_allowed = True
 
-    def set_data(self, support_data, sales_data):
-        data = GeneratedData(customer_support=support_data, sales_agent=sales_data)
-        self.generated_data = data
+    def set_data(self, data: dict[str, str]):
+        self.generated_data = GeneratedData(**data)
 
 
 class SyntheticDataDoc(BaseModel):
     id: ObjectId = Field(alias="_id", default_factory=make_id)
+    job_id: Optional[ObjectId] = None
     file_name: str
     succeed: bool
+    finished: bool = False
     col_name: Optional[str] = None
     reason: Optional[str] = None
-    data: list[GenerationStatus] = []
+    # statuses of rows are stored separately, pointing to this doc.
+    processed: int = 0
+    failed: int = 0
 
     class Config:
         arbitrary_types_allowed = True
 
-    def add_status(self, status: GenerationStatus):
-        self.data.append(status)
+
+# "writing" while output of finished rows is written, by whichever worker finished last.
+JobStates = Literal["queued", "running", "writing", "done", "failed"]
+
+
+class JobDoc(BaseModel):
+    id: ObjectId = Field(alias="_id", default_factory=make_id)
+    owner_key: str  # hash of credentials submitting it, so it's found again after a new login
+    file_names: list[str]
+    mode: str
+    chunking: str
+    execution: str = "realtime"
+    batches: list[str] = []  # ids of OpenAI batches submitted for the job, polled on resume
+    params: dict  # openai params of the submitting request
+    enqueued: bool = False  # rows of all files are in work queue, job can be resumed from there
+    state: JobStates = "queued"
+    reason: Optional[str] = None
+    result: Optional[dict] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+    class Config:
+        arbitrary_types_allowed = True
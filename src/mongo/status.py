@@ -0,0 +1,155 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Hashable
+
+from bson import ObjectId
+from pydantic_core import PydanticSerializationError
+from pymongo import ASCENDING, MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError, ConnectionFailure
+
+from ..decorators import handle_errors, retry
+from ..defaults import (
+    MONGO_COL_NAME,
+    MONGO_STATUS_COL_NAME,
+    STATUS_BATCH_SIZE,
+    STATUS_FLUSH_INTERVAL,
+)
+from ..exceptions.pydantic_exceptions import SerializationException
+from .db import Database
+from .errors import errors_map
+from .model import GenerationStatus
+
+DUPLICATE_KEY = 11000
+
+
+class StatusStore(Database):
+    "Generation statuses of rows, each pointing to its file doc which only keeps the counters."
+
+    _indexed: set[tuple[int, str]] = set()
+
+    def __init__(self, client: MongoClient, db_name: str = None) -> None:
+        super().__init__(client, db_name, MONGO_STATUS_COL_NAME)
+        self._docs = self._conn[self.db_name][MONGO_COL_NAME]
+        self._ensure_index()
+
+    @handle_errors(errors_map)
+    @retry((ConnectionFailure,))
+    def _ensure_index(self):
+        key = (id(self._conn), self._col.full_name)
+        if key in self._indexed:
+            return
+
+        # a row processed again after its worker died before acking it isn't added twice.
+        self._col.create_index([("doc_id", ASCENDING), ("row", ASCENDING)], unique=True)
+        self._indexed.add(key)
+
+    @handle_errors(
+        errors_map
+        | {
+            PydanticSerializationError: lambda _: SerializationException(
+                "Data Serialization failed at mongodb insert operation."
+            )
+        }
+    )
+    @retry((ConnectionFailure,))
+    def insert(self, statuses: list[GenerationStatus]):
+        "Inserts statuses in one batch and adds the new ones to the counters of their docs."
+
+        try:
+            self._col.insert_many(
+                [status.model_dump(by_alias=True) for status in statuses], ordered=False
+            )
+            duplicates = set()
+
+        except BulkWriteError as e:
+            errs = e.details["writeErrors"]
+            if any(err["code"] != DUPLICATE_KEY for err in errs):
+                raise e
+
+            duplicates = {err["index"] for err in errs}
+
+        counts: dict[ObjectId, list[int]] = {}
+        for i, status in enumerate(statuses):
+            if i not in duplicates:
+                count = counts.setdefault(status.doc_id, [0, 0])
+                count[0] += 1
+                count[1] += int(not status.succeed)
+
+        if len(counts) > 0:
+            self._docs.bulk_write(
+                [
+                    UpdateOne({"_id": doc_id}, {"$inc": {"processed": total, "failed": failed}})
+                    for doc_id, (total, failed) in counts.items()
+                ]
+            )
+
+    @handle_errors(errors_map)
+    @retry((ConnectionFailure,))
+    def count(self, doc_id: ObjectId):
+        "Exact counters of a doc, the incremented ones may miss a batch retried midway."
+
+        processed = self._col.count_documents({"doc_id": doc_id})
+        failed = self._col.count_documents({"doc_id": doc_id, "succeed": False})
+        return processed, failed
+
+    @handle_errors(errors_map)
+    def iterate(
+        self,
+        doc_id: ObjectId,
+        succeed: bool = None,
+        projection: dict = None,
+        skip: int = 0,
+        limit: int = 0,
+    ):
+        "Statuses of a doc in order of rows, read lazily from a cursor. No limit if it's 0."
+
+        query = {"doc_id": doc_id}
+        if succeed is not None:
+            query["succeed"] = succeed
+
+        cursor = self._col.find(query, projection).sort("row", ASCENDING).skip(skip).limit(limit)
+        yield from cursor
+
+
+class StatusWriter:
+    """
+    Buffers statuses of finished rows and writes them in batches, once STATUS_BATCH_SIZE
+    are gathered or STATUS_FLUSH_INTERVAL has passed since last write.
+    `on_flush` gets the keys given along with the statuses, once they are written."""
+
+    def __init__(
+        self,
+        store: StatusStore,
+        on_flush: Callable[[list[Hashable]], Awaitable] = None,
+        batch_size: int = STATUS_BATCH_SIZE,
+        interval: float = STATUS_FLUSH_INTERVAL,
+    ) -> None:
+        self._store = store
+        self._on_flush = on_flush
+        self.batch_size = batch_size
+        self.interval = interval
+
+        self._buffer: list[tuple[GenerationStatus, Hashable]] = []
+        self._flushed_at = time.monotonic()
+
+    async def add(self, status: GenerationStatus, key: Hashable = None):
+        self._buffer.append((status, key))
+
+        if (
+            len(self._buffer) >= self.batch_size
+            or time.monotonic() - self._flushed_at >= self.interval
+        ):
+            await self.flush()
+
+    async def flush(self):
+        # taking the buffer before any await, so rows finishing meanwhile go to next batch.
+        batch, self._buffer = self._buffer, []
+        self._flushed_at = time.monotonic()
+
+        if len(batch) == 0:
+            return
+
+        await asyncio.to_thread(self._store.insert, [status for status, _ in batch])
+
+        if self._on_flush is not None:
+            await self._on_flush([key for _, key in batch])
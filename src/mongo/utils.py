@@ -1,3 +1,5 @@
+import threading
+
 from bson import ObjectId
 from bson.errors import InvalidId
 from httpx import URL
@@ -5,8 +7,9 @@ from pymongo import MongoClient
 from pymongo.errors import ConnectionFailure, OperationFailure
 from pymongo.uri_parser import parse_uri
 
+from ..cache import ClientCache
 from ..decorators import handle_errors, retry
-from ..defaults import MONGO_CONNECTION_TIMEOUT, MONGO_DB_NAME
+from ..defaults import CLIENT_CLOSE_DELAY, MONGO_CONNECTION_TIMEOUT, MONGO_DB_NAME
 from ..exceptions.mongo_exceptions import AuthFailureException, InvalidObjectId
 from .errors import errors_map
 
@@ -49,6 +52,12 @@ def create_connection(url: str):
     return client
 
 
+@handle_errors(errors_map)
+@retry((ConnectionFailure,))
+def ping(client: MongoClient, url: str = None):
+    client.admin.command("ping")
+
+
 @handle_errors(
     errors_map
     | {
@@ -69,3 +78,24 @@ def ensure_connection(url: str):
     client = create_connection(url)
     test_write(client)
     return client
+
+
+def close_later(client: MongoClient):
+    timer = threading.Timer(CLIENT_CLOSE_DELAY, client.close)
+    timer.daemon = True
+    timer.start()
+
+
+_clients = ClientCache(ensure_connection, ping, close_later)
+
+
+def get_connection(url: str):
+    "Validated client for url, reused by the requests made with same url."
+
+    return _clients.get(url)
+
+
+def hold_connection(client: MongoClient):
+    "Keeps a client open for work outliving the requests, like background jobs."
+
+    return _clients.holding(client)
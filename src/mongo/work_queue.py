@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from pymongo import ASCENDING, MongoClient, ReturnDocument
+from pymongo.errors import ConnectionFailure
+
+from ..decorators import handle_errors, retry
+from ..defaults import MONGO_QUEUE_COL_NAME, WORK_LEASE_DURATION
+from ..work_queue import WORKER_ID
+from .db import Database
+from .errors import errors_map
+
+
+class MongoWorkQueue(Database):
+    """
+    Row tasks stored in a collection, so any process can lease them. Tasks of a worker dying
+    midway are leased again once their lease expires, instead of being lost with it."""
+
+    _indexed: set[tuple[int, str]] = set()
+
+    def __init__(self, client: MongoClient, db_name: str = None) -> None:
+        super().__init__(client, db_name, MONGO_QUEUE_COL_NAME)
+        self._ensure_index()
+
+    @handle_errors(errors_map)
+    @retry((ConnectionFailure,))
+    def _ensure_index(self):
+        key = (id(self._conn), self._col.full_name)
+        if key in self._indexed:
+            return
+
+        # leases take the lowest row of job, served from this index instead of sorting.
+        self._col.create_index([("job_id", ASCENDING), ("state", ASCENDING), ("row", ASCENDING)])
+        self._col.create_index("doc_id")
+        self._indexed.add(key)
+
+    @handle_errors(errors_map)
+    @retry((ConnectionFailure,))
+    def put(self, tasks: list[dict]):
+        self._col.insert_many(tasks, ordered=False)
+
+    @handle_errors(errors_map)
+    @retry((ConnectionFailure,))
+    def lease(self, job_id: ObjectId, duration: float = WORK_LEASE_DURATION):
+        "Takes a pending task of job, or one whose lease has expired, for `duration` seconds."
+
+        now = datetime.now(timezone.utc)
+
+        return self._col.find_one_and_update(
+            {
+                "job_id": job_id,
+                "$or": [
+                    {"state": "pending"},
+                    {"state": "leased", "lease_until": {"$lte": now}},
+                ],
+            },
+            {
+                "$set": {
+                    "state": "leased",
+                    "owner": WORKER_ID,
+                    "lease_until": now + timedelta(seconds=duration),
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("row", ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    @handle_errors(errors_map)
+    @retry((ConnectionFailure,))
+    def renew(self, task_id: ObjectId, duration: float = WORK_LEASE_DURATION):
+        "Extends lease of a task still held by this process for `duration` seconds from now."
+
+        self._col.update_one(
+            {"_id": task_id, "owner": WORKER_ID, "state": "leased"},
+            {"$set": {"lease_until": datetime.now(timezone.utc) + timedelta(seconds=duration)}},
+        )
+
+    @handle_errors(errors_map)
+    @retry((ConnectionFailure,))
+    def ack(self, task_ids: list[ObjectId]):
+        self._col.update_many(
+            {"_id": {"$in": task_ids}, "owner": WORKER_ID},
+            {"$set": {"state": "done", "lease_until": None}},
+        )
+
+    @handle_errors(errors_map)
+    @retry((ConnectionFailure,))
+    def release(self, task_id: ObjectId):
+        self._col.update_one(
+            {"_id": task_id, "owner": WORKER_ID},
+            {"$set": {"state": "pending", "owner": None, "lease_until": None}},
+        )
+
+    @handle_errors(errors_map)
+    @retry((ConnectionFailure,))
+    def discard(self, doc_id: ObjectId):
+        self._col.delete_many({"doc_id": doc_id})
+
+    @handle_errors(errors_map)
+    @retry((ConnectionFailure,))
+    def remaining(self, job_id: ObjectId):
+        return self._col.count_documents({"job_id": job_id, "state": {"$ne": "done"}})
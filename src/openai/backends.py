@@ -0,0 +1,96 @@
+import os
+from typing import Protocol
+
+import httpx
+import openai
+from openai import (
+    APIConnectionError,
+    InternalServerError,
+    RateLimitError,
+    UnprocessableEntityError,
+)
+
+from ..decorators import handle_errors, retry
+from ..defaults import LLM_BACKEND, OPENAI_MAX_CONNECTIONS, OPENAI_MAX_KEEPALIVE_CONNECTIONS
+from ..handlers.models import OpenAIParams
+from .chat_model import AsyncChatModel
+from .errors import errors_map
+from .fake_model import FakeChatModel
+
+
+class LLMBackend(Protocol):
+    "Chat model generating the interactions, returning content of its response."
+
+    params: OpenAIParams
+    backend: str  # part of the cache keys, so backends don't share generated interactions
+
+    async def invoke(self, msgs: list[dict], **kwargs) -> str: ...
+
+
+class CompatibleChatModel(AsyncChatModel):
+    "Chat model for servers with OpenAI compatible API like vLLM, serving their own models."
+
+    _clients: dict[tuple[str, str], openai.AsyncOpenAI] = {}
+
+    def __init__(
+        self, params: OpenAIParams = None, base_url: str = None, api_key: str = None, model=None
+    ) -> None:
+        super().__init__(params)
+        self.base_url = base_url
+        self.api_key = api_key or "EMPTY"  # local servers usually don't check it
+        self.model = model  # served model, in place of the one in params
+
+    @property
+    def backend(self):
+        return f"compatible:{self.base_url}:{self.model}"
+
+    def get_client(self):
+        key = (self.base_url, self.api_key)
+
+        client = self._clients.get(key)
+        if client is None:
+            client = self._clients[key] = openai.AsyncOpenAI(
+                base_url=self.base_url,
+                api_key=self.api_key,
+                max_retries=0,
+                http_client=openai.DefaultAsyncHttpxClient(
+                    limits=httpx.Limits(
+                        max_connections=OPENAI_MAX_CONNECTIONS,
+                        max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                    )
+                ),
+            )
+
+        return client
+
+    @handle_errors(errors_map)
+    @retry((APIConnectionError, UnprocessableEntityError, RateLimitError, InternalServerError))
+    async def invoke(self, msgs, **kwargs):
+        # not paced, these servers queue requests themselves and send no rate limit headers.
+        params = self.params.model_dump()
+        if self.model is not None:
+            params["model"] = self.model
+
+        res = await self.get_client().chat.completions.create(messages=msgs, **params, **kwargs)
+        return self._parse_response(res)
+
+
+def make_backend(params: OpenAIParams = None) -> LLMBackend:
+    """
+    Backend picked by `LLM_BACKEND` env, defaulting to LLM_BACKEND. "compatible" one is
+    configured by `LLM_BASE_URL`, `LLM_API_KEY` and `LLM_MODEL` envs."""
+
+    backend = os.environ.get("LLM_BACKEND", LLM_BACKEND)
+
+    if backend == "fake":
+        return FakeChatModel(params)
+
+    if backend == "compatible":
+        return CompatibleChatModel(
+            params,
+            os.environ.get("LLM_BASE_URL"),
+            os.environ.get("LLM_API_KEY"),
+            os.environ.get("LLM_MODEL"),
+        )
+
+    return AsyncChatModel(params)
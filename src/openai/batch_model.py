@@ -0,0 +1,272 @@
+import asyncio
+import hashlib
+import json
+import tempfile
+import time
+from typing import Awaitable, Callable
+
+from openai import APIConnectionError, InternalServerError, RateLimitError
+from openai.types.chat import ChatCompletion
+
+from ..decorators import handle_errors, retry
+from ..defaults import (
+    BATCH_COMPLETION_WINDOW,
+    BATCH_LINGER,
+    BATCH_MAX_BYTES,
+    BATCH_MAX_REQUESTS,
+    BATCH_MAX_WAIT,
+    BATCH_POLL_INTERVAL,
+)
+from ..exceptions import BaseAppException
+from ..exceptions.openai_exceptions import BatchException
+from ..logging import logger
+from .chat_model import AsyncChatModel
+from .errors import errors_map
+
+log = logger(__name__)
+
+ENDPOINT = "/v1/chat/completions"
+# batch is done with these, anything else means it's still in progress.
+FINAL_STATES = ("completed", "failed", "expired", "cancelled")
+
+
+class BatchRound:
+    "Requests submitted together as a single batch, each one resolved once the batch is done."
+
+    def __init__(self) -> None:
+        # lines of input file kept encoded, so size of the round is known as it grows.
+        self.requests: dict[str, tuple[bytes, asyncio.Future]] = {}
+        self.size = 0
+        self.started_at = time.monotonic()
+        self.updated_at = self.started_at
+
+    @property
+    def full(self):
+        return len(self.requests) >= BATCH_MAX_REQUESTS or self.size >= BATCH_MAX_BYTES
+
+    @staticmethod
+    def encode(custom_id: str, body: dict):
+        line = {"custom_id": custom_id, "method": "POST", "url": ENDPOINT, "body": body}
+        return json.dumps(line).encode("utf-8") + b"\n"
+
+    def fits(self, line: bytes):
+        return len(self.requests) == 0 or self.size + len(line) <= BATCH_MAX_BYTES
+
+    def add(self, custom_id: str, line: bytes):
+        fut = asyncio.get_running_loop().create_future()
+        # failures of requests no call waits on anymore aren't logged as never retrieved.
+        fut.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self.requests[custom_id] = (line, fut)
+        self.size += len(line)
+        self.updated_at = time.monotonic()
+        return fut
+
+    def resolve(self, custom_id: str, line: dict):
+        entry = self.requests.get(custom_id)
+        if entry is None or entry[1].done():
+            return
+
+        fut = entry[1]
+        res = line.get("response") or {}
+
+        if res.get("status_code") == 200:
+            fut.set_result(ChatCompletion.model_validate(res["body"]))
+            return
+
+        error = line.get("error") or (res.get("body") or {}).get("error") or {}
+        fut.set_exception(
+            BatchException(f"Request failed in batch: {error.get('message', 'unknown error')}")
+        )
+
+    def fail(self, e: BaseException):
+        for _, fut in self.requests.values():
+            if not fut.done():
+                fut.set_exception(e)
+
+
+def request_id(body: dict):
+    "Same id for the same request, so one submitted before the process died is found again."
+
+    return hashlib.sha256(json.dumps(body, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class BatchChatModel(AsyncChatModel):
+    """
+    Chat model sending its calls through OpenAI Batch API, for jobs that can wait for hours
+    at half the price. Calls made around the same time are gathered into one batch, so each
+    turn of the conversations of all rows in flight goes as a single round.
+    Batches submitted earlier, by a process running the same job before, can be `adopt`ed so
+    calls repeating their requests wait on them instead of being submitted again."""
+
+    def __init__(self, params=None, on_submit: Callable[[str], Awaitable] = None) -> None:
+        super().__init__(params)
+        self.on_submit = on_submit  # called with id of each submitted batch, to store it
+        self._round: BatchRound = None
+        self._pending: dict[str, asyncio.Future] = {}  # requests of rounds not done yet
+        self._adopted: dict[str, asyncio.Future] = {}  # requests of adopted batches, till used
+
+    async def invoke(self, msgs, **kwargs):
+        body = {"messages": msgs, **self.params.model_dump(), **kwargs}
+        custom_id = request_id(body)
+
+        fut = self._adopted.pop(custom_id, None) or self._pending.get(custom_id)
+        if fut is None:
+            fut = self._add(custom_id, body)
+
+        # shielded, the same request may be awaited by other rows too.
+        return self._parse_response(await asyncio.shield(fut))
+
+    def _add(self, custom_id: str, body: dict):
+        line = BatchRound.encode(custom_id, body)
+
+        if self._round is not None and not self._round.fits(line):
+            self._round = None  # would go over size limit, the waiting submitter sends it
+
+        if self._round is None:
+            self._round = BatchRound()
+            asyncio.ensure_future(self._submit_later(self._round))
+
+        fut = self._round.add(custom_id, line)
+        self._pending[custom_id] = fut
+        fut.add_done_callback(lambda _: self._pending.pop(custom_id, None))
+
+        if self._round.full:
+            self._round = None  # full, the waiting submitter sends it right away
+
+        return fut
+
+    async def adopt(self, batch_ids: list[str]):
+        """
+        Takes over requests of batches submitted earlier. Ones of finished batches are kept
+        only if they succeeded, so failed and expired requests are submitted again."""
+
+        for batch_id in batch_ids:
+            try:
+                res = await self._retrieve(batch_id)
+                batch = BatchRound()
+                await self._read_ids(res.input_file_id, batch)
+
+                if res.status in FINAL_STATES:
+                    await self._read_results(res, batch)
+                    # left without a result, e.g. batch failed before running, sent again.
+                    batch.fail(BatchException(f"Batch ended as '{res.status}'."))
+                else:
+                    asyncio.ensure_future(self._settle(batch, self._wait(res, batch)))
+
+            except BaseAppException as e:
+                log.warning("Couldn't adopt batch '%s', sending its calls again: %s", batch_id, e)
+                continue
+
+            for custom_id, (_, fut) in batch.requests.items():
+                if not fut.done() or fut.exception() is None:
+                    self._adopted[custom_id] = fut
+
+            log.info("Adopted batch '%s' in state '%s'.", batch_id, res.status)
+
+    async def _submit_later(self, batch: BatchRound):
+        "Waits till calls stop coming in, then submits the round and resolves its calls."
+
+        while not batch.full and self._round is batch:
+            now = time.monotonic()
+            if now - batch.updated_at >= BATCH_LINGER or now - batch.started_at >= BATCH_MAX_WAIT:
+                break
+
+            await asyncio.sleep(min(BATCH_LINGER, 1))
+
+        if self._round is batch:
+            self._round = None  # calls from now on go to next round
+
+        await self._settle(batch, self._run(batch))
+
+    @staticmethod
+    async def _settle(batch: BatchRound, coro: Awaitable):
+        "Runs `coro` resolving the calls of batch, failing the ones left if it raises."
+
+        try:
+            await coro
+
+        except BaseAppException as e:
+            batch.fail(e)
+
+        except Exception as e:
+            log.exception("Exception while running batch.")
+            batch.fail(e)
+
+    async def _run(self, batch: BatchRound):
+        with await asyncio.to_thread(self._write_input, batch) as file:
+            input_file = await self._upload(file)
+
+        res = await self._create(input_file.id)
+        log.info("Submitted batch '%s' of %d requests.", res.id, len(batch.requests))
+
+        if self.on_submit is not None:
+            try:
+                await self.on_submit(res.id)
+            except BaseAppException as e:
+                log.warning("Couldn't store batch '%s', resume won't find it: %s", res.id, e)
+
+        await self._wait(res, batch)
+
+    async def _wait(self, res, batch: BatchRound):
+        while res.status not in FINAL_STATES:
+            await asyncio.sleep(BATCH_POLL_INTERVAL)
+            res = await self._retrieve(res.id)
+
+        await self._read_results(res, batch)
+        batch.fail(BatchException(f"Request wasn't completed, batch ended as '{res.status}'."))
+
+    async def _read_results(self, res, batch: BatchRound):
+        # expired batches still have the results of requests completed in time.
+        for file_id in (res.output_file_id, res.error_file_id):
+            if file_id is not None:
+                await self._read_output(file_id, batch)
+
+    @staticmethod
+    def _write_input(batch: BatchRound):
+        file = tempfile.TemporaryFile()
+
+        for line, _ in batch.requests.values():
+            file.write(line)
+
+        file.seek(0)
+        return file
+
+    @handle_errors(errors_map)
+    @retry((APIConnectionError, RateLimitError, InternalServerError))
+    async def _upload(self, file):
+        file.seek(0)
+        return await self.get_client().files.create(file=("batch.jsonl", file), purpose="batch")
+
+    @handle_errors(errors_map)
+    @retry((APIConnectionError, RateLimitError, InternalServerError))
+    async def _create(self, input_file_id: str):
+        return await self.get_client().batches.create(
+            input_file_id=input_file_id,
+            endpoint=ENDPOINT,
+            completion_window=BATCH_COMPLETION_WINDOW,
+        )
+
+    @handle_errors(errors_map)
+    @retry((APIConnectionError, RateLimitError, InternalServerError))
+    async def _retrieve(self, batch_id: str):
+        return await self.get_client().batches.retrieve(batch_id)
+
+    @handle_errors(errors_map)
+    @retry((APIConnectionError, RateLimitError, InternalServerError))
+    async def _read_output(self, file_id: str, batch: BatchRound):
+        # streamed line by line, output of a large batch runs into hundreds of MBs.
+        async with self.get_client().files.with_streaming_response.content(file_id) as res:
+            async for line in res.iter_lines():
+                if len(line) > 0:
+                    line = json.loads(line)
+                    batch.resolve(line["custom_id"], line)
+
+    @handle_errors(errors_map)
+    @retry((APIConnectionError, RateLimitError, InternalServerError))
+    async def _read_ids(self, file_id: str, batch: BatchRound):
+        "Adds requests of the input file to batch, to be resolved from its output."
+
+        async with self.get_client().files.with_streaming_response.content(file_id) as res:
+            async for line in res.iter_lines():
+                if len(line) > 0:
+                    batch.add(json.loads(line)["custom_id"], b"")
@@ -0,0 +1,35 @@
+import hashlib
+import json
+
+from ..cache import LRUCache, TieredCache
+from ..defaults import INTERACTION_CACHE_SIZE, MAX_INTERACTIONS
+from ..handlers.models import OpenAIParams
+from ..mongo.cache import MongoCache
+from .prompt import PROMPT_VERSION
+
+# shared by all requests, keys are content addressed so nothing leaks between them.
+_memory = LRUCache(INTERACTION_CACHE_SIZE)
+
+
+def interaction_key(
+    source: str, response_cls, params: OpenAIParams, mode: str, backend: str = "openai"
+):
+    payload = {
+        "source": hashlib.sha256(source.encode("utf-8")).hexdigest(),
+        "type": response_cls.__name__,
+        "params": params.model_dump(),
+        "mode": mode,
+        "interactions": MAX_INTERACTIONS,
+        "prompt": PROMPT_VERSION,
+    }
+    if backend != "openai":  # keys of openai stay as they were before other backends
+        payload["backend"] = backend
+
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class InteractionCache(TieredCache):
+    "Generated interactions cached in memory, backed by an optional mongo tier."
+
+    def __init__(self, store: MongoCache = None) -> None:
+        super().__init__(_memory, store)
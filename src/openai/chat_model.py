@@ -1,83 +1,38 @@
+import httpx
 import openai
 from openai import (
     APIConnectionError,
-    APIError,
-    APIStatusError,
-    APITimeoutError,
-    AuthenticationError,
-    BadRequestError,
-    ConflictError,
     InternalServerError,
-    NotFoundError,
-    PermissionDeniedError,
     RateLimitError,
     UnprocessableEntityError,
 )
 
 from ..decorators import handle_errors, retry
-from ..exceptions.openai_exceptions import (
-    AIResponseException,
-    APIStatusException,
-    AuthException,
-    BadRequestException,
-    ConflictException,
-    ConnectionFailure,
-    InternalServerException,
-    NotFoundException,
-    OpenAIException,
-    PermissionDeniedException,
-    RateLimitException,
-    TimeoutException,
-    UnprocessableEntityException,
+from ..defaults import (
+    OPENAI_MAX_CONNECTIONS,
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS,
 )
+from ..exceptions.openai_exceptions import AIResponseException
 from ..handlers.models import OpenAIParams
 from ..logging import logger
+from .errors import errors_map
+from .rate_limiter import RateLimiter, estimate_tokens
 
 log = logger(__name__)
 
 
 class ChatModel:
+    "Base of the chat models, holding their params and parsing the responses they get."
+
     params = OpenAIParams()
+    backend = "openai"
 
     def __init__(self, params: OpenAIParams = None) -> None:
         if params is not None:
             self.params = params
 
-    @handle_errors(
-        {
-            APIConnectionError: lambda _: ConnectionFailure("Connection failure with OpenAI API."),
-            APITimeoutError: lambda _: TimeoutException("Operation timed out with OpenAI API."),
-            BadRequestError: lambda _: BadRequestException("Bad Request passed to OpenAI API."),
-            InternalServerError: lambda _: InternalServerException(
-                "OpenAI Server is having some internal issues."
-            ),
-            NotFoundError: lambda e: NotFoundException(
-                "This resource does not exist on openAI:"
-                f" {(e.body or {'message':'Response was None from openAI'})['message']}"
-            ),
-            ConflictError: lambda _: ConflictException(
-                "Resource conflict occured, Try again later."
-            ),
-            RateLimitError: lambda _: RateLimitException("OpenAI API is rate limited."),
-            AuthenticationError: lambda _: AuthException(
-                "OpenAI API Key is Invalid or Expired, It need to be replaced with a new API Key."
-            ),
-            PermissionDeniedError: lambda _: PermissionDeniedException(
-                "OpenAI API Key don't have permission to proceed with this request."
-            ),
-            UnprocessableEntityError: lambda _: UnprocessableEntityException(
-                "OpenAI API couldn't process the request."
-            ),
-            APIStatusError: lambda _: APIStatusException(
-                "Unsuccessful response code returned by OpenAI API."
-            ),
-            APIError: lambda _: OpenAIException("Some unexpected error occured with OpenAI API."),
-        }
-    )
-    @retry((APIConnectionError, UnprocessableEntityError))
-    def invoke(self, msgs, **kwargs):
-        res = openai.chat.completions.create(messages=msgs, **self.params.model_dump(), **kwargs)
-
+    @staticmethod
+    def _parse_response(res):
         log.info("OpenAI Token Usage: '%s'", res.usage.model_dump_json(indent=1))
 
         reasons = {
@@ -101,6 +56,47 @@ class ChatModel:
 
         return res.message.content
 
+
+class AsyncChatModel(ChatModel):
+    "Chat model running on the event loop, sharing one pooled OpenAI client across all calls."
+
+    _client: openai.AsyncOpenAI = None
+
     @classmethod
-    def set_params(cls, params: OpenAIParams):
-        cls.params = params
+    def get_client(cls):
+        if cls._client is None:
+            # openai's own defaults cap the pool at 100 connections which would
+            # make it the bottleneck long before the rate limits are reached.
+            # retries are left to `retry` decorator so they count against the retry budget.
+            cls._client = openai.AsyncOpenAI(
+                max_retries=0,
+                http_client=openai.DefaultAsyncHttpxClient(
+                    limits=httpx.Limits(
+                        max_connections=OPENAI_MAX_CONNECTIONS,
+                        max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                    )
+                )
+            )
+
+        return cls._client
+
+    @handle_errors(errors_map)
+    @retry((APIConnectionError, UnprocessableEntityError, RateLimitError, InternalServerError))
+    async def invoke(self, msgs, **kwargs):
+        limiter = RateLimiter.for_model(self.params.model)
+        tokens = estimate_tokens(msgs, self.params.max_completion_tokens)
+        await limiter.acquire(tokens)
+
+        try:
+            raw = await self.get_client().chat.completions.with_raw_response.create(
+                messages=msgs, **self.params.model_dump(), **kwargs
+            )
+        except RateLimitError as e:
+            limiter.update(e.response.headers)
+            raise e
+
+        limiter.update(raw.headers)
+        res = raw.parse()
+        limiter.settle(tokens, res.usage.total_tokens)
+
+        return self._parse_response(res)
@@ -1,13 +1,47 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, create_model
 
 from openai.lib._parsing import type_to_response_format_param
 
+from ..defaults import MAX_INTERACTIONS
+
 
 def attach_schema(cls):
     cls._schema = type_to_response_format_param(cls)
     return cls
 
 
+# interaction name -> response model, each one generated as its own conversation per row.
+interaction_types: dict[str, type["Discussion"]] = {}
+
+
+def make_conversation(cls):
+    "Response model holding a whole conversation of `cls` discussions, generated in one call."
+
+    model = create_model(
+        cls.__name__ + "Conversation",
+        __doc__=cls.__doc__,
+        discussions=(
+            list[cls],
+            Field(
+                description=f"Exactly {MAX_INTERACTIONS} discussions, each one covering"
+                " a different aspect than the others."
+            ),
+        ),
+    )
+    return attach_schema(model)
+
+
+def register_interaction(name: str):
+    def decorator(cls):
+        cls = attach_schema(cls)
+        cls._conversation = make_conversation(cls)
+        cls._name = name
+        interaction_types[name] = cls
+        return cls
+
+    return decorator
+
+
 class Discussion(BaseModel):
     question: str = Field(
         description="The question will be asked by user."
@@ -20,7 +54,7 @@ class Discussion(BaseModel):
     answer: str = Field(description="Concise answer to the question given in this response.")
 
 
-@attach_schema
+@register_interaction("customer_support")
 class CustomerSupportResponse(Discussion):
     """Interaction between user and customer support
     where you must return `question` that most likely to be asked by user
@@ -29,7 +63,7 @@ class CustomerSupportResponse(Discussion):
     and answer that must be given from the customer support."""
 
 
-@attach_schema
+@register_interaction("sales_agent")
 class SalesAgentResponse(Discussion):
     """Interaction between user and sales agent
     where you must return `question` that most likely to be asked by user
@@ -0,0 +1,57 @@
+from openai import (
+    APIConnectionError,
+    APIError,
+    APIStatusError,
+    APITimeoutError,
+    AuthenticationError,
+    BadRequestError,
+    ConflictError,
+    InternalServerError,
+    NotFoundError,
+    PermissionDeniedError,
+    RateLimitError,
+    UnprocessableEntityError,
+)
+
+from ..exceptions.openai_exceptions import (
+    APIStatusException,
+    AuthException,
+    BadRequestException,
+    ConflictException,
+    ConnectionFailure,
+    InternalServerException,
+    NotFoundException,
+    OpenAIException,
+    PermissionDeniedException,
+    RateLimitException,
+    TimeoutException,
+    UnprocessableEntityException,
+)
+
+errors_map = {
+    APIConnectionError: lambda _: ConnectionFailure("Connection failure with OpenAI API."),
+    APITimeoutError: lambda _: TimeoutException("Operation timed out with OpenAI API."),
+    BadRequestError: lambda _: BadRequestException("Bad Request passed to OpenAI API."),
+    InternalServerError: lambda _: InternalServerException(
+        "OpenAI Server is having some internal issues."
+    ),
+    NotFoundError: lambda e: NotFoundException(
+        "This resource does not exist on openAI:"
+        f" {(e.body or {'message':'Response was None from openAI'})['message']}"
+    ),
+    ConflictError: lambda _: ConflictException("Resource conflict occured, Try again later."),
+    RateLimitError: lambda _: RateLimitException("OpenAI API is rate limited."),
+    AuthenticationError: lambda _: AuthException(
+        "OpenAI API Key is Invalid or Expired, It need to be replaced with a new API Key."
+    ),
+    PermissionDeniedError: lambda _: PermissionDeniedException(
+        "OpenAI API Key don't have permission to proceed with this request."
+    ),
+    UnprocessableEntityError: lambda _: UnprocessableEntityException(
+        "OpenAI API couldn't process the request."
+    ),
+    APIStatusError: lambda _: APIStatusException(
+        "Unsuccessful response code returned by OpenAI API."
+    ),
+    APIError: lambda _: OpenAIException("Some unexpected error occured with OpenAI API."),
+}
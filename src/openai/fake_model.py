@@ -0,0 +1,132 @@
+import asyncio
+import hashlib
+import json
+import math
+import random
+
+import httpx
+from openai import (
+    APIConnectionError,
+    APIStatusError,
+    BadRequestError,
+    InternalServerError,
+    RateLimitError,
+    UnprocessableEntityError,
+)
+
+from ..decorators import handle_errors, retry
+from ..defaults import (
+    FAKE_ERROR_RATES,
+    FAKE_LATENCY,
+    FAKE_LATENCY_SIGMA,
+    FAKE_SEED,
+    MAX_INTERACTIONS,
+)
+from ..handlers.models import OpenAIParams
+from .chat_model import ChatModel
+from .errors import errors_map
+
+FAKE_URL = "http://fake-llm/v1/chat/completions"
+WORDS = (
+    "account order refund delivery plan price support service team product update "
+    "request issue help store payment option feature access policy time day week"
+).split()
+
+_errors = {
+    400: BadRequestError,
+    429: RateLimitError,
+    500: InternalServerError,
+    502: InternalServerError,
+    503: InternalServerError,
+}
+
+
+def fake_error(status: int):
+    res = httpx.Response(status, request=httpx.Request("POST", FAKE_URL))
+    return _errors.get(status, APIStatusError)(f"Fake error {status}.", response=res, body=None)
+
+
+def fake_value(schema: dict, root: dict, rng: random.Random, name: str = "value"):
+    "Value conforming to json `schema`, drawn from `rng`."
+
+    if "$ref" in schema:
+        ref = schema["$ref"].removeprefix("#/$defs/")
+        return fake_value(root["$defs"][ref], root, rng, name)
+
+    kind = schema.get("type")
+
+    if kind == "object":
+        return {
+            key: fake_value(prop, root, rng, key)
+            for key, prop in schema.get("properties", {}).items()
+        }
+
+    if kind == "array":
+        size = schema.get("minItems", MAX_INTERACTIONS)
+        return [fake_value(schema.get("items", {}), root, rng, name) for _ in range(size)]
+
+    if kind == "integer":
+        return rng.randint(0, 100)
+
+    if kind == "number":
+        return rng.random()
+
+    if kind == "boolean":
+        return rng.random() < 0.5
+
+    words = [rng.choice(WORDS) for _ in range(rng.randint(8, 24))]
+    return name.capitalize() + " about " + " ".join(words) + "."
+
+
+class FakeChatModel(ChatModel):
+    """
+    In-process stand-in for OpenAI, so load tests run offline without spending tokens.
+    Responses are built from the requested json schema, latencies are log-normal and errors are
+    raised at the given rates, all drawn from the request itself so reruns behave the same."""
+
+    backend = "fake"
+
+    def __init__(
+        self,
+        params: OpenAIParams = None,
+        latency: float = FAKE_LATENCY,
+        sigma: float = FAKE_LATENCY_SIGMA,
+        error_rates: dict[int, float] = None,
+        seed: int = FAKE_SEED,
+    ) -> None:
+        super().__init__(params)
+        self.latency = latency  # median secs
+        self.sigma = sigma
+        self.error_rates = FAKE_ERROR_RATES if error_rates is None else error_rates
+        self.seed = seed
+        self._attempts: dict[str, int] = {}  # failed attempts of requests, so retries differ
+
+    def _random(self, msgs, response_format):
+        payload = json.dumps([msgs, response_format, self.params.model_dump()], sort_keys=True)
+        digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        attempt = self._attempts.get(digest, 0)
+        return digest, random.Random(f"{self.seed}:{digest}:{attempt}")
+
+    @handle_errors(errors_map)
+    @retry((APIConnectionError, UnprocessableEntityError, RateLimitError, InternalServerError))
+    async def invoke(self, msgs, response_format: dict = None, **kwargs):
+        digest, rng = self._random(msgs, response_format)
+
+        if self.latency > 0:
+            await asyncio.sleep(rng.lognormvariate(math.log(self.latency), self.sigma))
+
+        draw = rng.random()
+        for status, rate in self.error_rates.items():
+            if draw < rate:
+                self._attempts[digest] = self._attempts.get(digest, 0) + 1
+                raise fake_error(status)
+
+            draw -= rate
+
+        self._attempts.pop(digest, None)
+
+        if response_format is None:
+            return fake_value({}, {}, rng, "answer")
+
+        schema = response_format["json_schema"]["schema"]
+        return json.dumps(fake_value(schema, schema, rng))
@@ -1,3 +1,6 @@
+# bump it whenever the prompts change, so cached interactions of older prompts aren't reused.
+PROMPT_VERSION = 1
+
 SYSTEM_PROMPT = (
     "Given a user-assistant conversation,"
     " what should be the next question from knowledge base given below:\n"
@@ -14,6 +17,20 @@ SYSTEM_PROMPT = (
     "Make sure the response must be JSON, and refuse to do anything else."
 )
 
+BATCH_SYSTEM_PROMPT = (
+    "Generate a whole user-assistant conversation from knowledge base given below:\n"
+    "{source}\n"
+    "Questions must be related to customer support"
+    " or a sales agent interactions from user side as the data"
+    " mostly belongs to an Organisation or some entitiy.\n"
+    "Return exactly {count} discussions in the order they would happen in the conversation."
+    " Please ensure that all questions are distinct and"
+    " each question should cover a different aspect of this topic without overlapping in meaning."
+    " Please focus solely on the particular interaction context and"
+    " avoid mixing in questions from other areas.\n"
+    "Make sure the response must be JSON, and refuse to do anything else."
+)
+
 
 def _escape(s: str):
     return '""""\n' + s.replace('""""', r"\"" * 4).strip() + '\n""""'
@@ -40,3 +57,8 @@ class Prompts:
     def gen_system_prompt(source: str):
         source = _escape(source)
         return system_prompt(SYSTEM_PROMPT.format(source=source))
+
+    @staticmethod
+    def gen_batch_system_prompt(source: str, count: int):
+        source = _escape(source)
+        return system_prompt(BATCH_SYSTEM_PROMPT.format(source=source, count=count))
@@ -0,0 +1,126 @@
+import asyncio
+import time
+
+from ..defaults import OPENAI_REQUESTS_PER_MINUTE, OPENAI_TOKENS_PER_MINUTE
+from ..logging import logger
+
+log = logger(__name__)
+
+# rough chars per token ratio for english text, good enough for pacing.
+CHARS_PER_TOKEN = 4
+TOKENS_PER_MESSAGE = 4
+
+
+def estimate_tokens(msgs: list[dict], max_completion_tokens: int):
+    prompt_tokens = sum(
+        len(msg["content"]) // CHARS_PER_TOKEN + TOKENS_PER_MESSAGE for msg in msgs
+    )
+    return prompt_tokens + max_completion_tokens
+
+
+class TokenBucket:
+    "Bucket refilling its whole capacity over a minute."
+
+    def __init__(self, capacity: float) -> None:
+        self.capacity = capacity
+        self.level = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.capacity / 60)
+        self._updated = now
+
+    def wait_time(self, amount: float):
+        self._refill()
+        amount = min(amount, self.capacity)  # never wait for more than the bucket can hold
+
+        if self.level >= amount:
+            return 0
+
+        return (amount - self.level) * 60 / self.capacity
+
+    def consume(self, amount: float):
+        self._refill()
+        self.level -= amount
+
+    def give_back(self, amount: float):
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+    def correct(self, limit: float = None, remaining: float = None):
+        self._refill()
+
+        if limit is not None and limit > 0:
+            self.capacity = limit
+
+        if remaining is not None:
+            self.level = min(self.level, remaining)
+
+
+def _header_value(headers, name: str):
+    value = headers.get(name)
+    if value is None:
+        return None
+
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class RateLimiter:
+    """
+    Paces requests to OpenAI on requests and tokens per minute before they are sent,
+    correcting its estimates from the `x-ratelimit-*` headers of the responses."""
+
+    _limiters: dict[str, "RateLimiter"] = {}
+
+    def __init__(
+        self,
+        requests_per_minute: int = OPENAI_REQUESTS_PER_MINUTE,
+        tokens_per_minute: int = OPENAI_TOKENS_PER_MINUTE,
+    ) -> None:
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def for_model(cls, model: str):
+        "Limits are enforced per model by OpenAI, so are the limiters."
+
+        limiter = cls._limiters.get(model)
+        if limiter is None:
+            limiter = cls._limiters[model] = cls()
+
+        return limiter
+
+    async def acquire(self, tokens: int):
+        # lock keeps the waiters in order, so big requests don't starve behind small ones.
+        async with self._lock:
+            while True:
+                wait = max(self._requests.wait_time(1), self._tokens.wait_time(tokens))
+                if wait <= 0:
+                    break
+
+                log.info("Pacing OpenAI request for %.2f secs", wait)
+                await asyncio.sleep(wait)
+
+            self._requests.consume(1)
+            self._tokens.consume(tokens)
+
+    def settle(self, estimated: int, used: int):
+        if used < estimated:
+            self._tokens.give_back(estimated - used)
+        else:
+            self._tokens.consume(used - estimated)
+
+    def update(self, headers):
+        self._requests.correct(
+            _header_value(headers, "x-ratelimit-limit-requests"),
+            _header_value(headers, "x-ratelimit-remaining-requests"),
+        )
+        self._tokens.correct(
+            _header_value(headers, "x-ratelimit-limit-tokens"),
+            _header_value(headers, "x-ratelimit-remaining-tokens"),
+        )
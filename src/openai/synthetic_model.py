@@ -1,12 +1,31 @@
+import asyncio
+import re
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Optional
+
 from pydantic_core import ValidationError
 
 from ..decorators import handle_errors
-from ..defaults import MAX_INTERACTIONS
+from ..defaults import GENERATION_MODE, MAX_INTERACTIONS
+from ..exceptions.openai_exceptions import AIResponseException
 from ..exceptions.pydantic_exceptions import ValidationException
-from .chat_model import ChatModel
-from .data_models import CustomerSupportResponse, SalesAgentResponse
+from .cache import InteractionCache, interaction_key
+from .backends import LLMBackend, make_backend
+from .data_models import interaction_types
 from .prompt import Prompts, assistant_prompt, user_prompt
 
+# called with interaction type, question and answer of each turn as soon as it's generated.
+turn_listener: ContextVar[Optional[Callable[[str, str, str], Awaitable]]] = ContextVar(
+    "turn_listener", default=None
+)
+
+
+async def notify_turn(response_cls, question: str, answer: str):
+    listener = turn_listener.get()
+    if listener is not None:
+        await listener(response_cls._name, question, answer)
+
+
 # Below 2 are kind of utility funcs to have better formatting of outputs
 
 
@@ -18,26 +37,40 @@ def format_answer(s: str):
     return "Agent: " + s + "\n\n"
 
 
+# turns of a conversation formatted by the above, to replay the ones served from cache.
+TURN_PATTERN = re.compile(r"User: (.*?)\nAgent: (.*?)\n\n(?=User: |$)", re.DOTALL)
+
+
+async def notify_cached_turns(response_cls, interactions: str):
+    if turn_listener.get() is None:
+        return
+
+    for question, answer in TURN_PATTERN.findall(interactions):
+        await notify_turn(response_cls, question, answer)
+
+
 class SyntheticDataModel:
-    def __init__(self, model: ChatModel = None) -> None:
+    def __init__(
+        self,
+        model: LLMBackend = None,
+        mode: str = GENERATION_MODE,
+        cache: InteractionCache = None,
+    ) -> None:
         if model is None:
-            model = ChatModel()
+            model = make_backend()
 
         self._model = model
+        self.mode = mode
+        self._cache = cache
+
+    async def _generate_turns(self, source: str, response_cls):
+        "Generates the conversation one turn per call, each call seeing the previous turns."
 
-    @handle_errors(
-        {
-            ValidationError: lambda e: ValidationException(
-                f"Validation failed with data model: {e.title}"
-            )
-        }
-    )
-    def _generate_interactions(self, source: str, response_cls):
         convos = [Prompts.gen_system_prompt(source)]
         ans = []
 
         for _ in range(MAX_INTERACTIONS):
-            res = self._model.invoke(convos, response_format=response_cls._schema)
+            res = await self._model.invoke(convos, response_format=response_cls._schema)
             res = response_cls.model_validate_json(res)
 
             convos.append(user_prompt(res.question))
@@ -46,10 +79,89 @@ class SyntheticDataModel:
             convos.append(assistant_prompt(res.answer))
             ans.append(format_answer(res.answer))
 
+            await notify_turn(response_cls, res.question, res.answer)
+
+        return "".join(ans)
+
+    async def _generate_batched(self, source: str, response_cls):
+        "Generates the whole conversation in a single call."
+
+        convos = [Prompts.gen_batch_system_prompt(source, MAX_INTERACTIONS)]
+        conversation_cls = response_cls._conversation
+
+        res = await self._model.invoke(convos, response_format=conversation_cls._schema)
+        res = conversation_cls.model_validate_json(res)
+
+        if len(res.discussions) == 0:
+            raise AIResponseException("Model returned no interactions.")
+
+        ans = []
+        for discussion in res.discussions[:MAX_INTERACTIONS]:
+            ans.append(format_question(discussion.question))
+            ans.append(format_answer(discussion.answer))
+            await notify_turn(response_cls, discussion.question, discussion.answer)
+
         return "".join(ans)
 
-    def generate_customer_support_interactions(self, source: str):
-        return self._generate_interactions(source, CustomerSupportResponse)
+    @handle_errors(
+        {
+            ValidationError: lambda e: ValidationException(
+                f"Validation failed with data model: {e.title}"
+            )
+        }
+    )
+    async def _generate_interactions(self, source: str, response_cls):
+        if self._cache is not None:
+            key = interaction_key(
+                source, response_cls, self._model.params, self.mode, self._model.backend
+            )
+            cached = await self._cache.get(key)
+            if cached is not None:
+                await notify_cached_turns(response_cls, cached)
+                return cached
+
+        if self.mode == "batched":
+            res = await self._generate_batched(source, response_cls)
+        else:
+            res = await self._generate_turns(source, response_cls)
+
+        if self._cache is not None:
+            await self._cache.set(key, res)
+
+        return res
+
+    async def generate_interactions(self, source: str):
+        "Generates every registered interaction type concurrently, keyed by its name."
+
+        names = list(interaction_types)
+        tasks = [
+            asyncio.ensure_future(self._generate_interactions(source, interaction_types[name]))
+            for name in names
+        ]
+
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:  # no use of the other conversations once one has failed
+                task.cancel()
+            raise
+
+        return dict(zip(names, results))
+
+    async def generate_chunked_interactions(self, chunks: list[str]):
+        "Generates interactions for each chunk of a source, joining them per interaction type."
+
+        tasks = [asyncio.ensure_future(self.generate_interactions(chunk)) for chunk in chunks]
+
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:  # row has failed already, no use of the other chunks
+                task.cancel()
+            raise
+
+        return {name: "".join(res[name] for res in results) for name in results[0]}
 
-    def generate_sales_agent_interactions(self, source: str):
-        return self._generate_interactions(source, SalesAgentResponse)
+    @property
+    def model_name(self):
+        return self._model.params.model
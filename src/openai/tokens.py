@@ -0,0 +1,96 @@
+import functools
+
+from ..defaults import MAX_SOURCE_CHUNKS, SOURCE_TOKEN_BUDGET
+from ..logging import logger
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+log = logger(__name__)
+
+# used when tiktoken isn't available, rough chars per token ratio for english text.
+CHARS_PER_TOKEN = 4
+
+
+@functools.lru_cache
+def _encoding(model: str):
+    if tiktoken is None:
+        return None
+
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+
+    except Exception:  # encodings are downloaded on first use, which may not be possible
+        log.exception("Failed to load tiktoken encoding, estimating tokens from length.")
+        return None
+
+
+def count_tokens(text: str, model: str):
+    encoding = _encoding(model)
+    if encoding is None:
+        return len(text) // CHARS_PER_TOKEN + 1
+
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def _split_line(line: str, budget: int, model: str):
+    "Hard splits a single line that is larger than budget by itself."
+
+    encoding = _encoding(model)
+    if encoding is None:
+        size = budget * CHARS_PER_TOKEN
+        return [line[i : i + size] for i in range(0, len(line), size)]
+
+    tokens = encoding.encode(line, disallowed_special=())
+    return [encoding.decode(tokens[i : i + budget]) for i in range(0, len(tokens), budget)]
+
+
+def split_tokens(text: str, budget: int, model: str, max_chunks: int = None):
+    "Splits text on line boundaries into chunks of at most `budget` tokens each."
+
+    chunks, lines, used = [], [], 0
+
+    for line in text.split("\n"):
+        parts = [line]
+        if count_tokens(line, model) >= budget:
+            parts = _split_line(line, budget - 1, model)
+
+        for part in parts:
+            size = count_tokens(part, model) + 1  # for the newline joining it
+
+            if used + size > budget and len(lines) > 0:
+                chunks.append("\n".join(lines))
+                lines, used = [], 0
+
+                if max_chunks is not None and len(chunks) >= max_chunks:
+                    return chunks
+
+            lines.append(part)
+            used += size
+
+    if len(lines) > 0:
+        chunks.append("\n".join(lines))
+
+    return chunks[:max_chunks]
+
+
+def prepare_source(source: str, chunking: str, model: str):
+    """
+    Fits source in the token budget before it is embedded in the prompts,
+    either keeping only its first chunk or splitting it in upto MAX_SOURCE_CHUNKS chunks."""
+
+    if count_tokens(source, model) <= SOURCE_TOKEN_BUDGET:
+        return [source]
+
+    max_chunks = 1 if chunking == "truncate" else MAX_SOURCE_CHUNKS
+    chunks = split_tokens(source, SOURCE_TOKEN_BUDGET, model, max_chunks)
+
+    log.info(
+        "Source is reduced to %s chunk(s) of upto %s tokens.", len(chunks), SOURCE_TOKEN_BUDGET
+    )
+    return chunks
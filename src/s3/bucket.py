@@ -10,22 +10,16 @@ from .utils import get_bucket
 
 
 class Bucket:
-    _session = None
-    _name = None
-
-    def __init__(self, name: str = None) -> None:
+    def __init__(self, session: boto3.Session, name: str) -> None:
         if name is None:
-            name = self._name
-
-            if name is None:
-                raise ConfigException("S3 bucket name is not provided.")
+            raise ConfigException("S3 bucket name is not provided.")
 
-        if self._session is None:
+        if session is None:
             raise ConfigException(
                 "S3 Session is not available for use, are there any creds provided?"
             )
 
-        self._resource = get_bucket(self._session, name)
+        self._resource = get_bucket(session, name)
 
     @handle_errors(errors_map)
     @retry((ConnectionError,))
@@ -33,7 +27,22 @@ class Bucket:
         self._resource.upload_fileobj(file, key)
         file.close()
 
-    @classmethod
-    def set_bucket_session(cls, ses: boto3.Session, name: str):
-        cls._session = ses
-        cls._name = name
+    @handle_errors(errors_map)
+    @retry((ConnectionError,))
+    def start_multipart(self, key: str):
+        return self._resource.Object(key).initiate_multipart_upload()
+
+    @handle_errors(errors_map)
+    @retry((ConnectionError,))
+    def upload_part(self, upload, number: int, data: bytes):
+        return upload.Part(number).upload(Body=data)["ETag"]
+
+    @handle_errors(errors_map)
+    @retry((ConnectionError,))
+    def complete_multipart(self, upload, parts: list[dict]):
+        upload.complete(MultipartUpload={"Parts": parts})
+
+    @handle_errors(errors_map)
+    @retry((ConnectionError,))
+    def abort_multipart(self, upload):
+        upload.abort()
@@ -0,0 +1,66 @@
+import asyncio
+from io import BytesIO
+
+from ..defaults import S3_PART_SIZE
+from .bucket import Bucket
+
+
+class MultipartWriter:
+    """
+    Streams an object to S3 in parts as data is written, so whole object is never held in memory.
+    Multipart upload is started only once the first part fills up,
+    smaller objects are uploaded in a single request on completion."""
+
+    def __init__(self, bucket: Bucket, key: str, part_size: int = S3_PART_SIZE) -> None:
+        self._bucket = bucket
+        self.key = key
+        self.part_size = part_size
+
+        self._buffer = bytearray()
+        self._upload = None
+        self._start_lock = asyncio.Lock()
+        self._parts: list[dict] = []
+        self._next_part = 1
+
+    async def _get_upload(self):
+        async with self._start_lock:
+            if self._upload is None:
+                self._upload = await asyncio.to_thread(self._bucket.start_multipart, self.key)
+
+        return self._upload
+
+    async def _upload_part(self, number: int, data: bytes):
+        upload = await self._get_upload()
+        etag = await asyncio.to_thread(self._bucket.upload_part, upload, number, data)
+        self._parts.append({"ETag": etag, "PartNumber": number})
+
+    async def _flush(self):
+        # taking the part number and data before any await, so concurrent writers keep the order.
+        number, self._next_part = self._next_part, self._next_part + 1
+        data, self._buffer = bytes(self._buffer), bytearray()
+
+        await self._upload_part(number, data)
+
+    async def write(self, data: bytes):
+        self._buffer += data
+
+        if len(self._buffer) >= self.part_size:
+            await self._flush()
+
+    async def complete(self):
+        "Must be called once all writes are done."
+
+        if self._next_part == 1:
+            file = BytesIO(bytes(self._buffer))
+            await asyncio.to_thread(self._bucket.upload_file, self.key, file)
+            return
+
+        if len(self._buffer) > 0:  # last part is allowed to be smaller than part size
+            await self._flush()
+
+        parts = sorted(self._parts, key=lambda part: part["PartNumber"])
+        await asyncio.to_thread(self._bucket.complete_multipart, self._upload, parts)
+
+    async def abort(self):
+        if self._upload is not None:
+            await asyncio.to_thread(self._bucket.abort_multipart, self._upload)
@@ -1,6 +1,7 @@
 import boto3
 from botocore.exceptions import ConnectionError
 
+from ..cache import ClientCache
 from ..decorators import handle_errors, retry
 from ..exceptions.common import ConfigException
 from ..exceptions.s3_exceptions import ClientException, InvalidRegionException
@@ -61,3 +62,18 @@ def ensure_session(data: S3Params):
     test_read(session, data.bucket_name)
     cleanup(session, data.bucket_name)
     return session
+
+
+@handle_errors(errors_map)
+@retry((ConnectionError,))
+def check_bucket(session: boto3.Session, data: dict):
+    session.client("s3").head_bucket(Bucket=data["bucket_name"])
+
+
+_sessions = ClientCache(lambda data: ensure_session(S3Params(**data)), check_bucket)
+
+
+def get_session(data: S3Params):
+    "Validated session for the params, reused by the requests made with same params."
+
+    return _sessions.get(data.model_dump())
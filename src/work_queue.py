@@ -0,0 +1,134 @@
+import heapq
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Hashable
+
+from bson import ObjectId
+
+from .defaults import WORK_LEASE_DURATION
+
+# owner of the leases taken by this process, a lease is only settled by the one holding it.
+WORKER_ID = uuid.uuid4().hex
+
+
+def make_task(job_id: ObjectId, doc_id: ObjectId, row: int, source: str):
+    return {
+        "_id": ObjectId(),
+        "job_id": job_id,
+        "doc_id": doc_id,
+        "row": row,
+        "source": source,
+        "state": "pending",
+        "attempts": 0,
+        "owner": None,
+        "lease_until": None,
+    }
+
+
+class MemoryWorkQueue:
+    """
+    Row tasks kept in process, with the same lease and ack semantics as the mongo queue.
+    Meant for local runs and tests, tasks are gone with the process."""
+
+    def __init__(self) -> None:
+        self._tasks: dict[Hashable, dict] = {}
+        # per job, pending task ids in order and a heap of (lease expiry, task id), so leasing
+        # doesn't scan all tasks. Ids of tasks settled since are skipped once reached.
+        self._pending: dict[ObjectId, deque[Hashable]] = {}
+        self._leases: dict[ObjectId, list[tuple[float, Hashable]]] = {}
+        self._remaining: dict[ObjectId, int] = {}
+        self._lock = threading.Lock()  # used from the threads running the queue calls
+
+    def put(self, tasks: list[dict]):
+        with self._lock:
+            for task in tasks:
+                task = self._tasks[task["_id"]] = dict(task)
+                job_id = task["job_id"]
+                self._pending.setdefault(job_id, deque()).append(task["_id"])
+                self._remaining[job_id] = self._remaining.get(job_id, 0) + 1
+
+    def _next(self, job_id: ObjectId, now: float):
+        leases = self._leases.get(job_id, [])
+        while len(leases) > 0 and leases[0][0] <= now:
+            lease_until, task_id = heapq.heappop(leases)
+            task = self._tasks.get(task_id)
+            if (
+                task is not None
+                and task["state"] == "leased"
+                and task["lease_until"] == lease_until
+            ):
+                return task
+
+        pending = self._pending.get(job_id, deque())
+        while len(pending) > 0:
+            task = self._tasks.get(pending.popleft())
+            if task is not None and task["state"] == "pending":
+                return task
+
+        return None
+
+    def lease(self, job_id: ObjectId, duration: float = WORK_LEASE_DURATION):
+        "Takes a pending task of job, or one whose lease has expired, for `duration` seconds."
+
+        now = time.time()
+
+        with self._lock:
+            task = self._next(job_id, now)
+            if task is None:
+                return None
+
+            task.update(state="leased", owner=WORKER_ID, lease_until=now + duration)
+            task["attempts"] += 1
+            heapq.heappush(self._leases.setdefault(job_id, []), (task["lease_until"], task["_id"]))
+            return dict(task)
+
+    def renew(self, task_id: ObjectId, duration: float = WORK_LEASE_DURATION):
+        "Extends lease of a task still held by this process for `duration` seconds from now."
+
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is not None and task["owner"] == WORKER_ID and task["state"] == "leased":
+                task["lease_until"] = time.time() + duration
+                heapq.heappush(self._leases[task["job_id"]], (task["lease_until"], task_id))
+
+    def _drop(self, task: dict):
+        "Counts task out of its job, dropping the job's indexes once none of its tasks are left."
+
+        job_id = task["job_id"]
+        self._remaining[job_id] -= 1
+
+        if self._remaining[job_id] == 0:
+            for index in (self._pending, self._leases, self._remaining):
+                index.pop(job_id, None)
+
+    def ack(self, task_ids: list[ObjectId]):
+        with self._lock:
+            for task_id in task_ids:
+                task = self._tasks.get(task_id)
+                if task is not None and task["owner"] == WORKER_ID and task["state"] != "done":
+                    task.update(state="done", lease_until=None)
+                    self._drop(task)
+
+    def release(self, task_id: ObjectId):
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is not None and task["owner"] == WORKER_ID and task["state"] == "leased":
+                task.update(state="pending", owner=None, lease_until=None)
+                self._pending[task["job_id"]].appendleft(task_id)
+
+    def discard(self, doc_id: ObjectId):
+        with self._lock:
+            for task_id, task in list(self._tasks.items()):
+                if task["doc_id"] == doc_id:
+                    del self._tasks[task_id]
+                    if task["state"] != "done":
+                        self._drop(task)
+
+    def remaining(self, job_id: ObjectId):
+        with self._lock:
+            return self._remaining.get(job_id, 0)
+
+
+memory_queue = MemoryWorkQueue()